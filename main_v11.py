@@ -1,17 +1,22 @@
-import os, re, time, random, unicodedata
-from datetime import datetime, timedelta
+import time
+# Marco zero da inicialização: antes de qualquer outro import, inclusive os da stdlib
+_STARTUP_T0 = time.perf_counter()
+import os, re, math, random, json, difflib, fnmatch, threading, signal, shutil, socket, subprocess, unicodedata
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import NamedTuple
+from datetime import datetime, timedelta, time as dtime
+from urllib.request import urlopen
 from zoneinfo import ZoneInfo
-import pyperclip
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException, JavascriptException, StaleElementReferenceException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import qrcode 
+# webdriver_manager, qrcode e websocket são importados só quando usados
+# (resolução do driver, login por QR e canal CDP), para acelerar o início.
+_IMPORTS_DONE = time.perf_counter()
 
 template = """ 
 terça-feira 23/09 😁
@@ -28,8 +33,332 @@ Volta 17:30
 6. ⁠Aline (unigram)
 """
 
+# Script assíncrono: instala um MutationObserver em div#main e só retorna quando
+# a caixa de texto do rodapé fica editável (grupo aberto) ou quando o tempo acaba.
+WAIT_GROUP_OPEN_JS = """
+const done = arguments[arguments.length - 1];
+const timeoutMs = arguments[0];
+const SEL = "footer div[contenteditable='true']";
+const ready = () => {
+    const el = document.querySelector(SEL);
+    return !!el && el.isContentEditable;
+};
+if (ready()) { done(true); return; }
+let timer = null, backstop = null, finished = false;
+const finish = (result) => {
+    if (finished) return;
+    finished = true;
+    obs.disconnect(); clearTimeout(timer); clearInterval(backstop);
+    done(result);
+};
+const obs = new MutationObserver(() => { if (ready()) finish(true); });
+// #app e não div#main: o WhatsApp pode trocar o #main inteiro enquanto esperamos
+obs.observe(document.querySelector("#app") || document.body,
+            {childList: true, subtree: true, attributes: true, attributeFilter: ["contenteditable"]});
+// Rede de segurança barata caso alguma troca escape do observer
+backstop = setInterval(() => { if (ready()) finish(true); }, 250);
+timer = setTimeout(() => finish(ready()), timeoutMs);
+"""
+
+# Nome da função exposta na página via Runtime.addBinding
+MESSAGE_FEED_BINDING = "__waBotFeed"
+
+# Observer a partir de #app: a cada lote de mutações que adiciona bolhas, empurra
+# para o Python (via binding) o texto das últimas `tail` mensagens como JSON.
+# O div[role="log"] é reconsultado quando sai do DOM (o WhatsApp pode remontá-lo);
+# se sumir de vez, empurra "null" uma vez para o Python voltar à leitura do DOM.
+MESSAGE_FEED_JS = """
+(tail) => {
+    const BUBBLE = "div.message-in, div.message-out";
+    const TEXT = "span._ao3e.selectable-text";
+    const findLog = () => document.querySelector('div#main div[role="log"]') || document.querySelector('div[role="log"]');
+    let log = findLog();
+    if (!log) return false;
+    if (window.__waBotFeedObserver) window.__waBotFeedObserver.disconnect();
+    let lost = false;
+    const push = () => {
+        if (!log || !log.isConnected) log = findLog();
+        if (!log) {
+            if (!lost) { lost = true; window.__waBotFeed("null"); }
+            return;
+        }
+        lost = false;
+        const items = [];
+        for (const bubble of Array.from(log.querySelectorAll(BUBBLE)).slice(-tail)) {
+            const span = bubble.querySelector(TEXT);
+            if (!span) continue;
+            const holder = bubble.closest("[data-id]");
+            items.push({id: holder ? holder.getAttribute("data-id") : null, text: span.innerText});
+        }
+        window.__waBotFeed(JSON.stringify(items));
+    };
+    const obs = new MutationObserver((muts) => {
+        if (!log || !log.isConnected) { push(); return; }
+        for (const m of muts) for (const n of m.addedNodes) {
+            if (n.nodeType === 1 && (n.matches(BUBBLE) || n.querySelector(BUBBLE))) { push(); return; }
+        }
+    });
+    obs.observe(document.querySelector("#app") || document.body, {childList: true, subtree: true});
+    window.__waBotFeedObserver = obs;
+    push();
+    return true;
+}
+"""
+
+# Caixa de texto do rodapé pronta para digitar (mesmo critério de search_input_text)
+COMPOSER_READY_JS = """
+const el = document.querySelector("footer div[contenteditable='true']");
+return !!el && el.isContentEditable && el.getClientRects().length > 0;
+"""
+
+# Foca a caixa de texto e seleciona todo o conteúdo antes do Input.insertText: o texto
+# inserido substitui o que tiver sobrado de uma tentativa anterior, em vez de somar
+FOCUS_COMPOSER_JS = """
+const el = document.querySelector("footer div[contenteditable='true']");
+if (!el || !el.isContentEditable) return false;
+el.focus();
+window.getSelection().selectAllChildren(el);
+return el === document.activeElement || el.contains(document.activeElement);
+"""
+
+# Script assíncrono: envio inteiro numa chamada só. Foca a caixa, insere o texto
+# (execCommand passa pelo beforeinput/input como a digitação), clica no botão de enviar
+# (ou aperta Enter, se não achar o botão) e espera a caixa esvaziar, sinal de que a mensagem foi aceita. Resultados:
+#   "missing"    caixa não existe       -> nada foi inserido
+#   "uninserted" o insert não pegou     -> nada foi inserido
+#   "inserted"   texto na caixa, Enter não enviou (ou submit=false)
+# O insert substitui todo o conteúdo da caixa: uma tentativa repetida depois de um
+# envio que falhou não duplica a lista.
+#   "sent"       caixa esvaziou depois do Enter
+FUSED_SEND_JS = """
+const done = arguments[arguments.length - 1];
+const [text, submit, timeoutMs] = arguments;
+const composer = () => document.querySelector("footer div[contenteditable='true']");
+const el = composer();
+if (!el || !el.isContentEditable) { done("missing"); return; }
+el.focus();
+window.getSelection().selectAllChildren(el);
+if (!document.execCommand("insertText", false, text) || !el.innerText.trim()) { done("uninserted"); return; }
+if (!submit) { done("inserted"); return; }
+const icon = document.querySelector("footer span[data-icon='send'], footer span[data-icon='wds-ic-send-filled']");
+const button = document.querySelector("footer button[aria-label='Enviar'], footer button[aria-label='Send']")
+    || (icon && icon.closest("button"));
+if (button) {
+    button.click();
+} else {
+    const key = {key: "Enter", code: "Enter", keyCode: 13, which: 13, bubbles: true, cancelable: true};
+    el.dispatchEvent(new KeyboardEvent("keydown", key));
+    el.dispatchEvent(new KeyboardEvent("keyup", key));
+}
+const deadline = performance.now() + timeoutMs;
+const check = () => {
+    const cur = composer();
+    if (!cur || !cur.innerText.trim()) { done("sent"); return; }
+    if (performance.now() > deadline) { done("inserted"); return; }
+    setTimeout(check, 10);
+};
+check();
+"""
+
+# Script assíncrono: rola div[role="log"] até o fim e retorna assim que a vista está
+# no fim com a última bolha visível (conferido a cada mutação e a cada `checkMs`),
+# ou quando o tempo acaba. Se já estiver no fim, retorna na hora sem rolar.
+SCROLL_TO_END_JS = """
+const done = arguments[arguments.length - 1];
+const checkMs = arguments[0];
+const timeoutMs = arguments[1];
+const log = document.querySelector('div#main div[role="log"]') || document.querySelector('div[role="log"]');
+if (!log) { done("missing"); return; }
+const atBottom = () => log.scrollHeight - log.scrollTop - log.clientHeight <= 2;
+const lastVisible = () => {
+    const bubbles = log.querySelectorAll("div.message-in, div.message-out");
+    if (!bubbles.length) return true;
+    const b = bubbles[bubbles.length - 1].getBoundingClientRect();
+    const v = log.getBoundingClientRect();
+    return b.top < v.bottom && b.bottom > v.top;
+};
+if (atBottom() && lastVisible()) { done("bottom"); return; }
+let finished = false;
+const finish = (result) => {
+    if (finished) return;
+    finished = true;
+    obs.disconnect(); clearInterval(tick); clearTimeout(limit);
+    done(result);
+};
+const check = () => {
+    if (finished) return;
+    if (atBottom() && lastVisible()) { finish("rendered"); return; }
+    log.scrollTop = log.scrollHeight;
+};
+const obs = new MutationObserver(check);
+obs.observe(log, {childList: true, subtree: true});
+const tick = setInterval(check, checkMs);
+const limit = setTimeout(() => finish("timeout"), timeoutMs);
+log.scrollTop = log.scrollHeight;
+check();
+"""
+
+# Cabeçalho do chat aberto: atributo title do nome (quando existe), texto do cabeçalho
+# como alternativa e se há div#main; tudo numa chamada.
+CHAT_HEADER_JS = """
+const main = document.querySelector("div#main");
+const header = main && main.querySelector("header");
+const titled = header && header.querySelector("span[title]");
+return JSON.stringify({
+    main: !!main,
+    header: !!header,
+    title: titled ? titled.getAttribute("title") : null,
+    text: header ? header.innerText : null,
+});
+"""
+
+# Lê numa única chamada o texto das últimas N bolhas (seleção do span feita no JS).
+SNAPSHOT_MESSAGES_JS = """
+const count = arguments[0];
+const root = document.querySelector("div#main") || document;
+const bubbles = Array.from(root.querySelectorAll("div.message-in, div.message-out")).slice(-count);
+const texts = [];
+for (const bubble of bubbles) {
+    const span = bubble.querySelector("span._ao3e.selectable-text");
+    if (span) texts.push(span.innerText);
+}
+return JSON.stringify(texts);
+"""
+
+# Lê numa única chamada, na lista lateral, a prévia da última mensagem e o
+# contador de não lidas de cada grupo. Grupos sem linha renderizada voltam found=false.
+SIDEBAR_PREVIEWS_JS = """
+const names = arguments[0];
+const side = document.querySelector("div#pane-side") || document;
+const out = {};
+for (const name of names) {
+    const title = Array.from(side.querySelectorAll("span[title]")).find(s => s.getAttribute("title") === name);
+    const row = title && title.closest('[role="row"], [role="listitem"]');
+    if (!row) { out[name] = {found: false, preview: "", unread: 0, signature: ""}; continue; }
+    const spans = Array.from(row.querySelectorAll("span[title]")).filter(s => s.getAttribute("title") !== name);
+    const preview = spans.length ? spans[spans.length - 1].getAttribute("title") : "";
+    let unread = 0;
+    for (const el of row.querySelectorAll("[aria-label]")) {
+        const label = el.getAttribute("aria-label").toLowerCase();
+        if (label.includes("unread") || label.includes("não lida")) { unread = parseInt(label, 10) || 1; break; }
+    }
+    out[name] = {found: true, preview: preview, unread: unread, signature: preview + "|" + unread + "|" + row.innerText.length};
+}
+return JSON.stringify(out);
+"""
+
+# Perfil "lean" do Chrome (CHROME_PROFILE=lean): desliga o que o bot nunca usa,
+# reduz a viewport e limita a memória do renderer.
+LEAN_CHROME_FLAGS = [
+    "--window-size=1024,768",
+    "--disable-extensions",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-breakpad",
+    "--disable-client-side-phishing-detection",
+    "--disable-domain-reliability",
+    "--metrics-recording-only",
+    "--no-pings",
+    "--mute-audio",
+    "--blink-settings=imagesEnabled=false",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,AudioServiceOutOfProcess,InterestFeedContentSuggestions,CalculateNativeWinOcclusion",
+    "--disable-site-isolation-trials",
+    "--renderer-process-limit=2",
+    "--js-flags=--max-old-space-size=512",
+]
+
+# Padrões (Network.setBlockedURLs) de mídia que o bot nunca precisa baixar:
+# fotos/vídeos/áudios/figurinhas (mmg, media-*.cdn) e fotos de perfil (pps).
+# Só por host: padrões de extensão (*.jpg*) bloqueariam também o que a allowlist
+# libera e pegariam URLs que não são mídia (.webm* casa com .webmanifest).
+MEDIA_BLOCK_PATTERNS = [
+    "*://mmg.whatsapp.net/*",
+    "*://*.mmg.whatsapp.net/*",
+    "*://media*.cdn.whatsapp.net/*",
+    "*://pps.whatsapp.net/*",
+]
+
 # ! TODO: ENVIAR PARA O GITHUB E SUBIR NO SERVIDOR
 
+# --- Tokenizador da lista: cada linha é classificada uma única vez ---
+LINE_BLANK, LINE_TITLE, LINE_TEXT = "blank", "title", "text"
+_INVISIBLE_RE = re.compile("[\u200b\u2060\ufeff]")          # ZWSP, word joiner, BOM
+_SECTION_TITLE_RE = re.compile(r"^[^\w]*(ida|volta)\b(.*)$")  # sobre o texto já sem acento/minúsculo
+_TITLE_TIME_RE = re.compile(r"\d{1,2}(?::\d{2}|h\d{0,2})")
+_LETTER_RE = re.compile(r"[a-z]")
+_TITLE_WORD_RE = re.compile(r"[a-z]+")
+_TITLE_MAX_WORDS = 2  # palavras entre Ida/Volta e o horário: "às", "de tarde", "manhã"
+_ENTRY_NUMBER_RE = re.compile(r"^\d+\s*[.)]\s*")
+
+class ListSection(NamedTuple):
+    title: str      # linha do título como veio ("Ida 11:15")
+    time: str       # horário do título ("11:15"; "" se não tiver)
+    names: tuple    # nomes limpos, minúsculos e sem duplicatas, na ordem da lista
+
+class ParsedList(NamedTuple):
+    head: str
+    ida: ListSection
+    volta: ListSection
+
+def _strip_accents_lower(s):
+    nfkd = unicodedata.normalize("NFKD", s or "")
+    return "".join(c for c in nfkd if not unicodedata.combining(c)).lower()
+
+def classify_line(line):
+    """
+    Classifica uma linha da lista: (LINE_BLANK, None, None), (LINE_TITLE, "ida"|"volta",
+    horário) ou (LINE_TEXT, None, nome limpo). Título é a linha que começa com a
+    palavra Ida/Volta (sem diferenciar maiúsculas/acentos) seguida de pontuação e,
+    opcionalmente, de um horário. Antes do horário cabem até duas palavras curtas
+    ("Ida às 11:15", "Volta de tarde 17h"); "Idalina" ou "Ida e Volta 18/10"
+    continuam sendo texto.
+    """
+    text = _INVISIBLE_RE.sub("", line).strip()
+    if not text:
+        return LINE_BLANK, None, None
+    # A decomposição Unicode só é necessária quando há caracteres fora do ASCII
+    folded = text.lower() if text.isascii() else _strip_accents_lower(text)
+    match = _SECTION_TITLE_RE.match(folded)
+    if match:
+        rest = match.group(2)
+        time_match = _TITLE_TIME_RE.search(rest)
+        if time_match:
+            # Poucas palavras antes do horário são conectivos; outra Ida/Volta ou uma frase, não
+            words = _TITLE_WORD_RE.findall(rest[:time_match.start()])
+            if len(words) <= _TITLE_MAX_WORDS and not {"ida", "volta"} & set(words):
+                return LINE_TITLE, match.group(1), time_match.group(0)
+        elif not _LETTER_RE.search(rest):
+            # Sem horário, só pontuação/emoji depois da palavra
+            return LINE_TITLE, match.group(1), ""
+    return LINE_TEXT, None, _ENTRY_NUMBER_RE.sub("", text, count=1).strip().lower()
+
+def assemble_list(lines, tokens):
+    """
+    Monta o ParsedList a partir das linhas já classificadas, sem reler o texto.
+    Cabeçalho = tudo antes do primeiro título; um título repetido continua a mesma
+    seção. None se faltar a seção de Ida ou a de Volta.
+    """
+    head, sections, current = [], {}, None
+    for line, (kind, key, value) in zip(lines, tokens):
+        if kind == LINE_TITLE:
+            current = sections.setdefault(key, (line.strip(), value, {}))
+        elif current is None:
+            head.append(line)
+        elif kind == LINE_TEXT:
+            current[2].setdefault(value)   # dict como conjunto ordenado
+    if "ida" not in sections or "volta" not in sections:
+        return None
+    build = lambda key: ListSection(sections[key][0], sections[key][1], tuple(n for n in sections[key][2] if n))
+    return ParsedList("\n".join(head).strip(), build("ida"), build("volta"))
+
+def tokenize_list(raw_text):
+    """Uma passada pelo texto: classifica cada linha e monta o ParsedList (ou None)."""
+    lines = raw_text.split("\n")
+    return assemble_list(lines, [classify_line(line) for line in lines])
+
 class WhatsAppBot:
     def __init__(self, groupName='Bot Test', whatList=1):
         self.debugging = False
@@ -46,7 +375,18 @@ class WhatsAppBot:
         self.alert_end_hour = 22
         self.alert_end_minute = 0
 
-        self.inputText = None
+        self.inputText = None # Cache da caixa de texto (ver get_composer)
+
+        # True -> no modo de alerta, bloqueia num MutationObserver em vez de fazer polling
+        self.eventDrivenOpen = os.getenv("EVENT_DRIVEN_OPEN", "1") == "1"
+        # Tempo máximo (s) de cada espera do observer antes de reavaliar a janela de horário
+        self.openWatchTimeout = 60
+        # Esperas explícitas com o grupo aberto (o poll_interval na janela de alerta é ~1 s):
+        # lista ilegível/envio falhou e lista que não é de hoje
+        self.retryWait = 15
+        self.staleListWait = 180
+        # Folga (s) de progresso durante recover_session: lançamento + página + QR (max_wait=300)
+        self.recoveryAllowance = 480
 
         self.ZWSP = "\u200b"
 
@@ -58,133 +398,377 @@ class WhatsAppBot:
         self.list_sent_for_today = False
         self.last_check_date = None
         
+        # True -> recebe as mensagens novas por push (CDP) em vez de reler o DOM
+        self.useMessageFeed = os.getenv("MESSAGE_FEED", "1") == "1"
+        self.messageFeed = None
+        # True -> sem o canal de push, lê as mensagens com um único execute_script
+        self.snapshotExtraction = os.getenv("SNAPSHOT_EXTRACTION", "1") == "1"
+
+        # True -> com o grupo fechado, já deixa a resposta pronta para a lista mais recente
+        self.preArm = os.getenv("PRE_ARM", "1") == "1"
+        self.prearmInterval = 5
+        self.armedPayload = None  # (texto da lista original, lista reconstruída)
+        self.last_prearm_time = 0.0
+
+        # True -> mantém a lista já processada e só classifica de novo as linhas que mudaram
+        self.incrementalParse = os.getenv("INCREMENTAL_PARSE", "1") == "1"
+        self.listModel = ListModel()
+
+        # True -> comandos do caminho crítico (caixa de texto, leitura, envio) vão direto
+        # pelo WebSocket CDP da aba, sem o HTTP do chromedriver; falhas voltam ao Selenium
+        self.cdpTransport = os.getenv("CDP_TRANSPORT", "1") == "1"
+        self.hotSession = None
+        self.hot_retry_at = 0.0
+
+        # True -> foco + texto + Enter + confirmação numa única chamada (FUSED_SEND_JS);
+        # se o Enter sintético não enviar, completa com um Enter real pelo CDP
+        self.fusedSend = os.getenv("FUSED_SEND", "1") == "1"
+        self.sendConfirmTimeout = 0.5
+
+        # True -> sem o canal de push, só rola e relê o chat quando a prévia do grupo
+        # na lista lateral muda para algo que parece uma lista
+        self.sidebarWatch = os.getenv("SIDEBAR_WATCH", "1") == "1"
+        self.last_preview_signature = None
+
+        # Spans do ciclo e logs adiados (impressos fora do caminho crítico)
+        self.trace = CycleTrace(self.timeZone)
+
+        # Calcula quando acordar a partir das janelas configuradas acima
+        self.scheduler = PollScheduler(
+            self.timeZone, self.days_to_run,
+            run_start=(self.hourStartBot, self.minuteStartBot), run_end=(self.hourFinishBot, 0),
+            alert_start=(self.alert_start_hour, self.alert_start_minute), alert_end=(self.alert_end_hour, self.alert_end_minute),
+        )
+
+        # True -> aprende o horário típico de abertura e usa no lugar da janela fixa de alerta
+        self.learnOpeningTime = os.getenv("LEARN_OPEN_TIME", "1") == "1"
+        self.openHistory = None
+        if self.learnOpeningTime:
+            default_history = os.path.join(os.getenv("CHROME_USER_DATA_DIR", "./whatsapp_session_data"), "open_history.json")
+            self.openHistory = OpeningHistory(os.getenv("OPEN_HISTORY_PATH", default_history))
+            self.scheduler.history = self.openHistory
+        # Segundos antes da abertura prevista para pré-aquecer a sessão
+        self.prewarmSeconds = 10
+        self.scheduler.prewarm_lead = self.prewarmSeconds
+        self.prewarmed_date = None
+        self.last_group_open = None # Estado anterior, para detectar a virada fechado -> aberto
+
         # Class Whatsapp
         self.whatsapp = None
         self.group_whatsapp_is_open = False
 
     def main(self):
         self.open_whatsapp_web()
-        self.group_whatsapp_is_open = True if self.whatsapp.open_grup_whatsapp_web() else False
+        self.group_whatsapp_is_open = True if self.whatsapp.open_grup_whatsapp_web(self.groupName) else False
+        if self.group_whatsapp_is_open:
+            self.start_message_feed()
+            startup_profile.report()
         
         print("Bot em modo de vigilância 24/7...")
 
         while True:
             try:
-                if(not self.group_whatsapp_is_open):
-                    self.group_whatsapp_is_open = True if self.whatsapp.open_grup_whatsapp_web() else False
-                    time.sleep(50)
-                    continue
-
-                current_time = datetime.now(self.timeZone)
-                current_date = current_time.date()
-                day_of_week = current_time.weekday() # Pega o dia da semana atual
-
-                if self.last_check_date != current_date:
-                    self.list_sent_for_today = False
-                    self.last_check_date = current_date
-                    print(f"[{current_time.strftime('%H:%M:%S')}] Novo dia. Bot pronto para a lista de hoje.")
-                    print(self.hourStartBot, self.hourFinishBot, day_of_week)
-
-                is_in_time_window = self.hourStartBot <= current_time.hour < self.hourFinishBot and current_time.minute >= self.minuteStartBot
-                is_correct_day = day_of_week in self.days_to_run
-
-                if self.list_sent_for_today or not is_in_time_window or not is_correct_day:
-                    if not is_correct_day and is_in_time_window and not self.list_sent_for_today:
-                        # Log para sabermos por que ele está dormindo
-                        print(f"[{current_time.strftime('%H:%M:%S')}] Hoje não é um dia de lista. Bot em espera.")
-                    
-                    time.sleep(300) # Dorme por 5 minutos
-                    continue
-
-                # --- LÓGICA DO MODO DE ALERTA ---
-                is_in_alert_window = (
-                    (current_time.hour > self.alert_start_hour or 
-                    (current_time.hour == self.alert_start_hour and current_time.minute >= self.alert_start_minute)) 
-                    and 
-                    (current_time.hour < self.alert_end_hour or 
-                    (current_time.hour == self.alert_end_hour and current_time.minute < self.alert_end_minute))
-                )
-
-                # self.is_group_open()
-                if self.is_group_open():
-                    print(f"[{current_time.strftime('%H:%M:%S')}] GRUPO ABERTO! Iniciando operação em velocidade máxima.")
-                    self.whatsapp._scroll_to_end()
-                    
-                    
-                    group_list = self.get_list_from_whatsapp()
-                    if not group_list:
-                        print(f"[{current_time.strftime('%H:%M:%S')}] Erro crítico: Grupo aberto, mas caixa de texto inacessível. Tentando novamente...")
-                        time.sleep(1) # Pausa mínima para a UI assentar
-                        continue
-
-                    print(f"[{current_time.strftime('%H:%M:%S')}] Caixa de texto 'armada'. Processando a lista...")
-
-                    self.inputText = self.search_input_text(1)
-                    # group_list = template # Para testes locais
-
-                    if not group_list:
-                        print(f"[{current_time.strftime('%H:%M:%S')}] Nenhuma lista encontrada. Tentando novamente em breve.")
-                        time.sleep(15) # Espera um pouco antes de verificar de novo
-                        continue # Volta para o início do loop while
-
-                    if not self.is_list_from_today(group_list):
-                        print(f"[{current_time.strftime('%H:%M:%S')}] A lista encontrada não é de hoje. Ignorando e tentando novamente mais tarde.")
-                        time.sleep(180) # Espera 3 minutos antes de verificar de novo
-                        continue
-
-                    if self.nameToAdd.lower() in group_list.lower():
-                        print(f"[{current_time.strftime('%H:%M:%S')}] Meu nome já está na lista. Ação cancelada para hoje.")
-                        self.list_sent_for_today = True
-                        continue
-
-                    head_list, ida_list, volta_list = self.parse_schedule_robust(group_list)
-                    go_list_with_name, back_list_with_name = self.put_name_in_list(ida_list, volta_list)
-                    reconstruct_list = self.reconstruct_list(back_list_with_name, go_list_with_name, head_list)
-
-                    print(f"[{current_time.strftime('%H:%M:%S')}] Lista reconstruída:\n---\n{reconstruct_list}\n---")
-                    start_send_time = time.monotonic()
-
-                    # Ação imediata, sem pausa
-                    sucess = self.send_message_with_javascript(reconstruct_list)
-                    end_send_time = time.monotonic()
-                    duration = end_send_time - start_send_time
-                    if(sucess == True):
-                        self.list_sent_for_today = True
-                        print(f"[{current_time.strftime('%H:%M:%S')}] Operação concluída em {duration:.2f} segundos. Entrando em modo de espera até amanhã.")
-                    else:
-                        print(f"[{current_time.strftime('%H:%M:%S')}] Falha ao enviar a lista. Tentando novamente em breve.")
-                        time.sleep(15) # Espera um pouco antes de verificar de novo
-                        continue # Volta para o início do loop while
-
-                else:
-                    # Decide a duração da pausa com base no modo de alerta
-                    if is_in_alert_window:
-                        print(f"[{current_time.strftime('%H:%M:%S')}] MODO DE ALERTA. Grupo fechado. Verificando em alta frequência...")
-                        sleep_duration = random.uniform(0.7, 1.5)
-                    else:
-                        print(f"[{current_time.strftime('%H:%M:%S')}] Monitoramento normal. Grupo fechado. Verificando novamente em breve...")
-                        sleep_duration = random.uniform(10, 20)
-                    
-                    time.sleep(sleep_duration)
-
+                wait = self.run_cycle()
             except WebDriverException:
-                print("Erro crítico com o WebDriver (ex: navegador fechou). Reiniciando...")
-                self.group_whatsapp_is_open = False
-                self.open_whatsapp_web()
+                self.trace.log("Erro crítico com o WebDriver (ex: navegador fechou). Reiniciando...")
+                self.trace.flush()
+                self.handle_driver_failure()
+                wait = 0
             except Exception as e:
-                print(f"Ocorreu um erro inesperado no loop principal: {e}")
+                self.trace.log(f"Ocorreu um erro inesperado no loop principal: {e}")
                 self.group_whatsapp_is_open = False
-                time.sleep(60)
+                wait = 60
+            self.trace.mark_progress(wait)
+            if wait:
+                self._sleep(wait)
+
+    def roll_day(self, current_time):
+        """Na virada do dia libera o bot para a lista do novo dia."""
+        current_date = current_time.date()
+        if self.last_check_date == current_date:
+            return
+        self.list_sent_for_today = False
+        self.last_check_date = current_date
+        # A lista de ontem pode virar "de hoje": força uma releitura completa
+        self.last_preview_signature = None
+        # Resposta armada para a lista de outro dia nunca deve ser enviada
+        self.armedPayload = None
+        self.trace.log("Novo dia. Bot pronto para a lista de hoje.")
+        self.trace.log(f"{self.hourStartBot} {self.hourFinishBot} {current_time.weekday()}")
+        start, end, expected = self.scheduler.alert_window(current_time)
+        self.trace.log(f"Janela de alerta de hoje: {start.strftime('%H:%M:%S')}-{end.strftime('%H:%M:%S')} (abertura esperada {expected.strftime('%H:%M:%S')})")
+
+    def is_active(self, current_time):
+        """True se hoje é dia de lista, está dentro da janela e a lista ainda não foi enviada."""
+        return (
+            not self.list_sent_for_today
+            and current_time.weekday() in self.days_to_run
+            and self.scheduler.in_run_window(current_time)
+        )
+
+    def idle_wait(self, current_time):
+        """Quanto esperar até a próxima verificação, sem nenhuma ação pendente."""
+        if not self.is_active(current_time):
+            return self.scheduler.seconds_until_next_run(current_time, self.list_sent_for_today)
+        return self.scheduler.poll_interval(current_time)
+
+    def run_cycle(self):
+        """
+        Um ciclo do loop principal (não dorme). Retorna quantos segundos esperar
+        antes do próximo ciclo; 0 para seguir imediatamente.
+        """
+        if(not self.group_whatsapp_is_open):
+            self.group_whatsapp_is_open = True if self.whatsapp.open_grup_whatsapp_web(self.groupName) else False
+            if self.group_whatsapp_is_open:
+                self.start_message_feed()
+                startup_profile.report()
+                return 0
+            return 50
+
+        self.trace.new_cycle()
+        current_time = datetime.now(self.timeZone)
+        current_date = current_time.date()
+        day_of_week = current_time.weekday() # Pega o dia da semana atual
+
+        self.roll_day(current_time)
+
+        is_in_time_window = self.scheduler.in_run_window(current_time)
+        is_correct_day = day_of_week in self.days_to_run
+
+        if self.list_sent_for_today or not is_in_time_window or not is_correct_day:
+            if not is_correct_day and is_in_time_window and not self.list_sent_for_today:
+                # Log para sabermos por que ele está dormindo
+                self.trace.log("Hoje não é um dia de lista. Bot em espera.")
+            
+            # Dorme até o início da próxima janela (nunca passa do horário)
+            return self.scheduler.seconds_until_next_run(current_time, self.list_sent_for_today)
+
+        # --- LÓGICA DO MODO DE ALERTA ---
+        is_in_alert_window = self.scheduler.in_alert_window(current_time)
+
+        with self.trace.span("poll"):
+            group_open = bool(self.is_group_open())
+
+        if group_open and self.last_group_open is False and self.openHistory is not None:
+            # Só registra viradas observadas; se já estava aberto não sabemos quando abriu
+            self.openHistory.record(current_time)
+            self.trace.log("Abertura do grupo registrada no histórico.")
+        self.last_group_open = group_open
+
+        if group_open:
+            self.trace.log("GRUPO ABERTO! Iniciando operação em velocidade máxima.")
+            reconstruct_list = self.take_armed_payload()
+            if reconstruct_list:
+                self.trace.log("Resposta pré-armada confere com a lista atual. Enviando direto.")
+            else:
+                reconstruct_list, wait = self.prepare_reply_on_open()
+                if not reconstruct_list:
+                    return wait
+
+            self.trace.log(f"Lista reconstruída:\n---\n{reconstruct_list}\n---")
+
+            # Ação imediata, sem pausa
+            with self.trace.span("send") as send_span:
+                sucess = self.send_message_with_javascript(reconstruct_list)
+            duration = send_span["end"] - send_span["start"]
+            if(sucess == True):
+                self.list_sent_for_today = True
+                self.trace.log(f"Operação concluída em {duration:.2f} segundos. Entrando em modo de espera até amanhã.")
+                return 0
+
+            self.trace.log("Falha ao enviar a lista. Tentando novamente em breve.")
+            return self.retryWait
+
+        # Decide a duração da pausa com base no modo de alerta
+        if is_in_alert_window and self.prewarmed_date != current_date and self.scheduler.should_prewarm(current_time):
+            self.prewarm()
+            self.prewarmed_date = current_date
+
+        if is_in_alert_window and self.preArm:
+            self.prearm_reply()
+
+        if is_in_alert_window and self.eventDrivenOpen:
+            self.trace.log("MODO DE ALERTA. Grupo fechado. Aguardando abertura via MutationObserver...")
+            # Bloqueia até a caixa de texto ficar editável; o próximo ciclo já a encontra
+            self.trace.flush()
+            with self.trace.span("watch"):
+                self.whatsapp.wait_for_group_open(self.scheduler.watch_timeout(current_time, self.openWatchTimeout))
+            return 0
+
+        sleep_duration = self.scheduler.poll_interval(current_time)
+        if is_in_alert_window:
+            self.trace.log(f"MODO DE ALERTA. Grupo fechado. Verificando de novo em {sleep_duration:.1f}s...")
+        else:
+            self.trace.log(f"Monitoramento normal. Grupo fechado. Verificando de novo em {sleep_duration:.1f}s...")
+        return sleep_duration
+
+    def handle_driver_failure(self):
+        self.group_whatsapp_is_open = False
+        self.last_group_open = None
+        self.stop_message_feed()
+        self.recover_session()
+
+    def _sleep(self, seconds):
+        """Imprime os logs pendentes e só então dorme (fora do caminho crítico)."""
+        self.trace.flush()
+        time.sleep(seconds)
+
+    def prewarm(self):
+        """
+        Poucos segundos antes da abertura prevista deixa a sessão pronta:
+        canal de push ativo, conversa rolada até o fim e resposta pré-armada.
+        """
+        self.trace.log("Pré-aquecendo a sessão para a abertura prevista.")
+        with self.trace.span("prewarm"):
+            if self.useMessageFeed and (self.messageFeed is None or not self.messageFeed.ready):
+                self.start_message_feed()
+            self.whatsapp._scroll_to_end()
+            self.get_composer(timeout=0) # Revalida/relocaliza a caixa, se já existir
+            if self.preArm:
+                self.last_prearm_time = 0.0
+                self.prearm_reply()
+
+    def prepare_reply_on_open(self):
+        """
+        Caminho sem pré-armamento: com o grupo já aberto, lê, valida e reconstrói a lista.
+        Retorna (lista pronta para envio, 0) ou (None, segundos até tentar de novo).
+        """
+        with self.trace.span("scroll"):
+            self.whatsapp._scroll_to_end()
+        
+        with self.trace.span("extract"):
+            group_list = self.get_list_from_whatsapp()
+        if not group_list:
+            self.trace.log("Erro crítico: Grupo aberto, mas caixa de texto inacessível. Tentando novamente...")
+            return None, 1 # Pausa mínima para a UI assentar
+
+        self.trace.log("Caixa de texto 'armada'. Processando a lista...")
+
+        self.get_composer(1)
+        # group_list = template # Para testes locais
+
+        if not group_list:
+            self.trace.log("Nenhuma lista encontrada. Tentando novamente em breve.")
+            return None, self.retryWait
+
+        if not self.is_list_from_today(group_list):
+            self.trace.log("A lista encontrada não é de hoje. Ignorando e tentando novamente mais tarde.")
+            return None, self.staleListWait
+
+        if self.nameToAdd.lower() in group_list.lower():
+            self.trace.log("Meu nome já está na lista. Ação cancelada para hoje.")
+            self.list_sent_for_today = True
+            return None, 0
+
+        reply = self.build_reply(group_list)
+        if reply is None:
+            return None, self.retryWait
+        return reply, 0
+
+    def build_reply(self, group_list):
+        """
+        Faz o parsing da lista, adiciona o nome e devolve o texto pronto para envio.
+        Retorna None se a lista não tiver as seções de Ida e Volta.
+        """
+        with self.trace.span("parse"):
+            parsed = self.parse_schedule_robust(group_list)
+        if parsed is None:
+            self.trace.log("[AVISO] Lista sem as seções de Ida e Volta reconhecíveis.")
+            return None
+        with self.trace.span("rebuild"):
+            # O primeiro item de cada lista é o horário da seção (ver reconstruct_list)
+            ida_list = [parsed.ida.time, *parsed.ida.names]
+            volta_list = [parsed.volta.time, *parsed.volta.names]
+            go_list_with_name, back_list_with_name = self.put_name_in_list(ida_list, volta_list)
+            return self.reconstruct_list(back_list_with_name, go_list_with_name, parsed.head)
+
+    def prearm_reply(self):
+        """
+        Com o grupo fechado, mantém pronta a resposta para a lista válida mais recente,
+        para que na abertura só reste conferir o frescor e enviar.
+        """
+        if time.monotonic() - self.last_prearm_time < self.prearmInterval:
+            return
+        self.last_prearm_time = time.monotonic()
+
+        if self.messageFeed is None or not self.messageFeed.ready:
+            if not self.sidebar_has_new_list():
+                return
+            # Sem o canal de push, garante que as últimas mensagens estão renderizadas
+            self.whatsapp._scroll_to_end()
+
+        group_list = self.get_list_from_whatsapp(verbose=False)
+        if self.armedPayload is not None and self.armedPayload[0] == group_list:
+            return
+
+        self.armedPayload = None
+        if not group_list or not self.is_list_from_today(group_list):
+            return
+        if self.nameToAdd.lower() in group_list.lower():
+            return
+
+        reply = self.build_reply(group_list)
+        if reply is None:
+            return
+        self.armedPayload = (group_list, reply)
+        self.trace.log("[DEBUG] Resposta pré-armada para a lista atual.")
+
+    def sidebar_has_new_list(self):
+        """
+        Caminho rápido pela lista lateral: lê só a prévia da última mensagem do grupo.
+        True quando vale a pena rolar e reler o chat: na primeira leitura, quando a
+        prévia não pode ser lida ou quando mudou. Qualquer mudança conta: uma conversa
+        logo depois da lista muda a prévia para algo que não parece lista, e a releitura
+        (get_list_from_whatsapp olha as últimas mensagens) ainda acha a lista.
+        """
+        if not self.sidebarWatch:
+            return True
+        try:
+            with self.trace.span("sidebar"):
+                info = self.whatsapp.read_sidebar_previews([self.groupName])[self.groupName]
+        except JavascriptException:
+            return True
+        if not info["found"]:
+            return True
+
+        if info["signature"] == self.last_preview_signature:
+            return False
+        self.last_preview_signature = info["signature"]
+        return True
+
+    def take_armed_payload(self):
+        """
+        Consome a resposta pré-armada se a lista mais recente do chat ainda for
+        a mesma usada para montá-la. Caso contrário retorna None.
+        """
+        if self.armedPayload is None:
+            return None
+        raw_text, reply = self.armedPayload
+        self.armedPayload = None
+        # A mesma lista pode ter ficado no chat desde outro dia: revalida a data (sem round trip)
+        if not self.is_list_from_today(raw_text):
+            return None
+        # Checagem de frescor: com o canal de push não custa nenhum round trip
+        with self.trace.span("freshness"):
+            if self.get_list_from_whatsapp(verbose=False) != raw_text:
+                return None
+        return reply
 
     def is_group_open(self):
         """
         Verifica se o grupo está aberto para não-admins, procurando pela caixa de texto.
         Retorna True se estiver aberto, False caso contrário.
         """
+        session = self.hot_session()
+        if session is not None:
+            try:
+                return bool(session.call_script(COMPOSER_READY_JS))
+            except WebDriverException:
+                self.drop_hot_session()
         try:
             # Usamos um tempo de espera bem curto (1-2 segundos)
             # Se a caixa de texto for encontrada rápido, o grupo está aberto.
-            input = self.search_input_text()
+            input = self.get_composer()
             if(input is not None):
                 return True
         except TimeoutException:
@@ -213,27 +797,155 @@ class WhatsAppBot:
             # Se nenhum dos candidatos for encontrado, retorna None
             return None
 
+    def get_composer(self, timeout=2):
+        """
+        Retorna a caixa de texto, reaproveitando a referência em cache enquanto ela
+        continuar no DOM e editável (uma única chamada). Só refaz a busca quando a
+        referência fica stale ou o grupo fecha.
+        """
+        if self.inputText is not None:
+            try:
+                if self.driver.execute_script(
+                    "return arguments[0].isConnected && arguments[0].isContentEditable", self.inputText
+                ):
+                    return self.inputText
+            except StaleElementReferenceException:
+                pass
+            self.inputText = None
+
+        self.inputText = self.search_input_text(timeout)
+        return self.inputText
+
+    def hot_session(self):
+        """
+        Sessão CDP do caminho crítico: reaproveita a do canal de push ou abre uma
+        própria. None se o transporte estiver desligado ou indisponível (tenta de
+        novo depois de alguns segundos).
+        """
+        if not self.cdpTransport or self.whatsapp is None:
+            return None
+        # Depois de uma falha (inclusive da sessão do canal de push), fica no chromedriver por um tempo
+        if time.monotonic() < self.hot_retry_at:
+            return None
+        if self.messageFeed is not None and self.messageFeed.session.connected:
+            return self.messageFeed.session
+        if self.hotSession is not None and self.hotSession.connected:
+            return self.hotSession
+        try:
+            self.hotSession = self.whatsapp.open_cdp_session()
+            return self.hotSession
+        except Exception as e:
+            print(f"[AVISO] Transporte CDP indisponível, usando o chromedriver: {e}")
+            self.hotSession = None
+            self.hot_retry_at = time.monotonic() + 30
+            return None
+
+    def drop_hot_session(self, backoff=30):
+        """
+        Fecha a sessão própria e deixa o caminho crítico no chromedriver por `backoff`
+        segundos, inclusive a sessão do canal de push (que pode estar travada).
+        """
+        if self.hotSession is not None:
+            self.hotSession.close()
+            self.hotSession = None
+        self.hot_retry_at = time.monotonic() + backoff
+
+    def _send_via_cdp(self, session, message):
+        """
+        Foco + insertText + Enter pelo WebSocket CDP. Retorna None se nem chegou a
+        inserir o texto (o chamador pode tentar pelo chromedriver sem duplicar).
+        """
+        try:
+            if not session.call_script(FOCUS_COMPOSER_JS):
+                return None
+        except WebDriverException:
+            self.drop_hot_session()
+            return None
+        try:
+            session.send("Input.insertText", {"text": message})
+            if self.sendMensage:
+                self._press_enter(session)
+            return True
+        except WebDriverException as e:
+            print(f"[ERRO] {e}")
+            self.drop_hot_session()
+            return False
+
+    def _press_enter(self, session=None):
+        """Enter "de verdade" (Input.dispatchKeyEvent), pelo WebSocket ou pelo chromedriver."""
+        send = session.send if session is not None else self.driver.execute_cdp_cmd
+        for kind in ("keyDown", "keyUp"):
+            send("Input.dispatchKeyEvent", {
+                "type": kind, "key": "Enter", "code": "Enter", "windowsVirtualKeyCode": 13
+            })
+
+    def _fused_send(self, session, message):
+        """
+        Roda FUSED_SEND_JS numa ida e volta só. Retorna o status do script ou
+        "error" se a chamada falhou (estado desconhecido: não tenta de novo).
+        """
+        timeout_ms = int(self.sendConfirmTimeout * 1000)
+        try:
+            if session is not None:
+                return session.call_async_script(
+                    FUSED_SEND_JS, message, self.sendMensage, timeout_ms, timeout=self.sendConfirmTimeout + 5
+                )
+            # O script timeout da sessão já foi definido (apply_script_timeout); não gasta outra chamada
+            return self.driver.execute_async_script(FUSED_SEND_JS, message, self.sendMensage, timeout_ms)
+        except WebDriverException as e:
+            print(f"[ERRO] Envio em uma chamada falhou: {e}")
+            if session is not None:
+                self.drop_hot_session()
+            return "error"
+
     def send_message_with_javascript(self, message):
+        session = self.hot_session()
+        if self.fusedSend:
+            status = self._fused_send(session, message)
+            if status == "sent" or (status == "inserted" and not self.sendMensage):
+                return True
+            if status == "inserted":
+                # Texto já está na caixa: falta só o Enter (não insere de novo)
+                try:
+                    self._press_enter(session)
+                    return True
+                except WebDriverException as e:
+                    print(f"[ERRO] {e}")
+                    return False
+            if status not in ("missing", "uninserted"):
+                return False
+            # Nada foi inserido: segue pelo caminho em etapas (espera a caixa, insertText)
+            session = self.hot_session()
+        if session is not None:
+            sent = self._send_via_cdp(session, message)
+            if sent is not None:
+                return sent
         try:
-            box = self.inputText if self.inputText else self.search_input_text()
+            box = self.get_composer()
             if not box:
                 print("[ERRO] Caixa não encontrada")
                 return False
 
             # foco
-            box.click()
+            try:
+                box.click()
+            except StaleElementReferenceException:
+                # A caixa foi recriada entre a validação e o clique: busca de novo uma vez
+                self.inputText = None
+                box = self.get_composer()
+                if not box:
+                    print("[ERRO] Caixa não encontrada")
+                    return False
+                box.click()
+            # Seleciona o que já estiver na caixa para o insert substituir (sem duplicar)
+            self.driver.execute_script(FOCUS_COMPOSER_JS)
 
             # INSERE TUDO DE UMA VEZ (inclui \n para quebras)
             self.driver.execute_cdp_cmd("Input.insertText", {"text": message})
 
             if self.sendMensage:
                 # Enter para enviar
-                self.driver.execute_cdp_cmd("Input.dispatchKeyEvent", {
-                    "type": "keyDown", "key": "Enter", "code": "Enter", "windowsVirtualKeyCode": 13
-                })
-                self.driver.execute_cdp_cmd("Input.dispatchKeyEvent", {
-                    "type": "keyUp", "key": "Enter", "code": "Enter", "windowsVirtualKeyCode": 13
-                })
+                self._press_enter()
             return True
         except Exception as e:
             print(f"[ERRO] {e}")
@@ -241,14 +953,15 @@ class WhatsAppBot:
         
     def reconstruct_list(self, back_list, go_list, head_list):
         fullList = ""
+        # Índice 0 de cada lista: horário da seção (título); o resto são os nomes
         for i, name in enumerate(go_list):
-            if(name == '11:15'):
+            if(i == 0):
                 fullList += f"{head_list.strip()}\n\n Ida {name} \n"
             else:
                 fullList += f" {i}.{self.ZWSP}{name.title()} \n"
 
         for i, name in enumerate(back_list):
-            if(name == '17:30'):
+            if(i == 0):
                 fullList += f" \n Volta {name} \n"
             else:
                 fullList += f" {i}.{self.ZWSP}{name.title()} \n"
@@ -274,94 +987,153 @@ class WhatsAppBot:
         # if self.driver is None:
         #     raise RuntimeError("Falha crítica: O grupo não foi encontrado. Reiniciando o processo...")
 
+    def recover_session(self):
+        """
+        Depois de um WebDriverException: primeiro tenta se reconectar ao Chrome que
+        continua vivo (segundos); só relança o navegador do zero se isso falhar.
+        """
+        self.inputText = None
+        # Reconectar ou relançar (com possível novo login por QR) acontece dentro de uma
+        # volta só do loop: avisa o supervisor para não tomar isso como loop travado
+        self.trace.mark_progress(self.recoveryAllowance)
+        # A conexão CDP antiga aponta para a aba de antes; reabre sob demanda
+        self.drop_hot_session(backoff=0)
+        with self.trace.span("reconnect"), startup_profile.phase("reattach"):
+            reattached = self.whatsapp is not None and self.whatsapp.reattach()
+        if reattached:
+            self.driver = self.whatsapp.driver
+            # Se o chat continua aberto, nem precisa clicar no grupo de novo
+            self.group_whatsapp_is_open = self.whatsapp.is_chat_open()
+            if self.group_whatsapp_is_open:
+                self.start_message_feed()
+                startup_profile.report()
+            self.trace.log("Reconectado ao Chrome que já estava rodando.")
+            self.trace.flush()
+            return
+
+        self.trace.log("Não foi possível reaproveitar o Chrome. Reinício completo...")
+        self.trace.flush()
+        if self.whatsapp is not None:
+            self.whatsapp.shutdown()
+        self.open_whatsapp_web()
+
+    def start_message_feed(self):
+        """
+        Abre o canal de push (CDP) e instala o observer de mensagens no chat aberto.
+        Em caso de falha, a leitura continua sendo feita direto no DOM.
+        """
+        if not self.useMessageFeed:
+            return
+        self.stop_message_feed()
+        try:
+            with startup_profile.phase("message_feed"):
+                session = self.whatsapp.open_cdp_session()
+                feed = MessageFeed(session)
+                feed.install()
+            self.messageFeed = feed
+            print("[DEBUG] Canal de mensagens por push (CDP) ativo.")
+        except Exception as e:
+            print(f"[AVISO] Não foi possível ativar o canal de mensagens por push: {e}")
+            self.messageFeed = None
+
+    def stop_message_feed(self):
+        if self.messageFeed is not None:
+            self.messageFeed.close()
+            self.messageFeed = None
+
     def is_message_a_valid_list(self, message_text):
         """
         Verifica se o texto de uma mensagem parece ser uma lista de horários válida.
-        Retorna True se contiver os marcadores principais, False caso contrário.
+        Retorna True se tiver um título de Ida e um de Volta (classify_line), False caso
+        contrário: "Idalina ... volta" numa conversa comum não conta como lista.
         """
-        text = message_text.lower()
-        # A nossa heurística principal: uma lista válida deve ter "ida" e "volta".
-        return 'ida' in text and 'volta' in text
+        found = set()
+        for line in message_text.split("\n"):
+            kind, key, _ = classify_line(line)
+            if kind == LINE_TITLE:
+                found.add(key)
+                if len(found) == 2:
+                    return True
+        return False
 
-    def get_list_from_whatsapp(self):
+    def get_list_from_whatsapp(self, verbose=True):
         """
         Extrai o texto da lista mais recente, procurando nas últimas 5 mensagens
         para ignorar mensagens aleatórias que possam ter sido enviadas depois.
         """
         try:
-            # Pega as últimas 5 bolhas de mensagem.
-            last_messages = self.driver.find_elements(
-                By.XPATH, 
-                "(//div[contains(@class,'message-in') or contains(@class,'message-out')])[position() > last() - 5]"
-            )
+            # Pega o texto das últimas 5 mensagens.
+            last_messages = self._read_last_messages(5)
             
             # Itera sobre as mensagens da mais nova para a mais antiga
-            for message_bubble in reversed(last_messages):
-                try:
-                    content_container = message_bubble.find_element(
-                        By.XPATH, 
-                        ".//span[contains(@class, '_ao3e') and contains(@class, 'selectable-text')]"
-                    )
-                    raw_text = content_container.text
-
-                    # USA A NOVA FUNÇÃO DE VALIDAÇÃO AQUI!
-                    if self.is_message_a_valid_list(raw_text):
-                        print(f"Lista válida encontrada:\n---\n{raw_text}\n---")
-                        return raw_text # Retorna a primeira lista válida que encontrar
-                        
-                except NoSuchElementException:
-                    # Esta bolha pode não ter texto (ex: uma imagem), ignora e continua
-                    continue
-
-            print("Nenhuma lista válida encontrada nas últimas 5 mensagens.")
+            for raw_text in reversed(last_messages):
+                # USA A NOVA FUNÇÃO DE VALIDAÇÃO AQUI!
+                if self.is_message_a_valid_list(raw_text):
+                    if verbose:
+                        self.trace.log(f"Lista válida encontrada:\n---\n{raw_text}\n---")
+                    return raw_text # Retorna a primeira lista válida que encontrar
+
+            if verbose:
+                self.trace.log("Nenhuma lista válida encontrada nas últimas 5 mensagens.")
             return "" # Retorna vazio se não encontrar nenhuma lista
 
         except Exception as e:
-            print(f"Ocorreu um erro inesperado ao procurar a lista: {e}")
+            self.trace.log(f"Ocorreu um erro inesperado ao procurar a lista: {e}")
             return ""
 
-    def parse_schedule_robust(self, raw_text):
+    def _read_last_messages(self, count=5):
         """
-        Recebe o texto bruto e extrai as listas de Ida e Volta de forma robusta.
-        Retorna um dicionário com as duas listas limpas.
+        Retorna o texto das últimas `count` mensagens, da mais antiga para a mais nova.
+        Usa o buffer local do canal de push quando disponível (zero round trips).
         """
+        if self.messageFeed is not None and self.messageFeed.ready:
+            return self.messageFeed.latest(count)
 
-        print(f"[DEBUG] Texto bruto recebido para parsing:\n{raw_text}\n---")
-        
-        # Usar split é mais seguro para separar as seções
-        try:
-            # Separa o bloco de Ida do resto
-            before_volta, after_volta = raw_text.split("Volta", 1)
-            # Pega só o que vem depois de "Ida"
-            go_block_list = before_volta.split("Ida", 1)
-            head_block, ida_block = go_block_list
-
-            volta_block = after_volta
-        except ValueError:
-            # Retorno seguro caso o texto não tenha os marcadores esperados
-            return {'head': '', 'ida': [], 'volta': []}
-
-        # Limpa cada bloco de texto de forma independente
-        ida_list = self.clean_name_list(ida_block)
-        volta_list = self.clean_name_list(volta_block)
-    
-        return head_block, ida_list, volta_list
+        if self.snapshotExtraction:
+            return self._read_last_messages_snapshot(count)
 
-    def clean_name_list(self, block_text):
-        """Função interna para limpar um bloco de texto e retornar uma lista de nomes."""
-        cleaned_list = []
-        # Usamos um set para garantir que não haja duplicatas DENTRO da mesma lista
-        seen_names = set()
-        
-        for line in block_text.split('\n'):
-            # Limpa o nome: remove números, pontos, caracteres ZWSP e espaços
-            name = re.sub(r"^\s*\d+\.\s*", "", line).strip().lower()
-            name = name.replace(self.ZWSP, '').strip()
+        last_messages = self.driver.find_elements(
+            By.XPATH, 
+            f"(//div[contains(@class,'message-in') or contains(@class,'message-out')])[position() > last() - {count}]"
+        )
+        texts = []
+        for message_bubble in last_messages:
+            try:
+                content_container = message_bubble.find_element(
+                    By.XPATH, 
+                    ".//span[contains(@class, '_ao3e') and contains(@class, 'selectable-text')]"
+                )
+                texts.append(content_container.text)
+            except NoSuchElementException:
+                # Esta bolha pode não ter texto (ex: uma imagem), ignora e continua
+                continue
+        return texts
+
+    def _read_last_messages_snapshot(self, count=5):
+        """
+        Mesma leitura de `_read_last_messages`, mas num único round trip:
+        o script devolve um array JSON com o innerText das últimas `count` bolhas.
+        """
+        session = self.hot_session()
+        if session is not None:
+            try:
+                return json.loads(session.call_script(SNAPSHOT_MESSAGES_JS, count) or "[]")
+            except WebDriverException:
+                self.drop_hot_session()
+        return json.loads(self.driver.execute_script(SNAPSHOT_MESSAGES_JS, count) or "[]")
 
-            if name and name not in seen_names:
-                cleaned_list.append(name)
-                seen_names.add(name)
-        return cleaned_list
+    def parse_schedule_robust(self, raw_text):
+        """
+        Recebe o texto bruto e extrai cabeçalho, Ida e Volta numa única passada
+        (ver classify_line). Retorna um ParsedList ou None se faltar alguma seção.
+        """
+        if self.debugging:
+            # Vai para o trace: formatado e impresso só no flush, fora do caminho crítico
+            self.trace.log(f"[DEBUG] Texto bruto recebido para parsing:\n{raw_text}\n---")
+
+        if self.incrementalParse:
+            return self.listModel.update(raw_text)
+        return tokenize_list(raw_text)
 
     def is_list_from_today(self, message_text: str) -> bool:
         """
@@ -378,41 +1150,1045 @@ class WhatsAppBot:
         }
 
         if self.debugging:
-            print("[DEBUG] Modo de depuração ativo: ignorando validação de data.")
+            self.trace.log("[DEBUG] Modo de depuração ativo: ignorando validação de data.")
             return True
 
         # --- Verificação Principal: Lista para AMANHÃ ---
         tomorrow_date_str = tomorrow.strftime('%d/%m')
         if tomorrow_date_str in text_lower:
-            print(f"[VALIDAÇÃO] Lista validada pela data de AMANHÃ: {tomorrow_date_str}")
+            self.trace.log(f"[VALIDAÇÃO] Lista validada pela data de AMANHÃ: {tomorrow_date_str}")
             return True
 
         tomorrow_weekday_str = dias_semana.get(tomorrow.weekday())
         if tomorrow_weekday_str and tomorrow_weekday_str in text_lower:
-            print(f"[VALIDAÇÃO] Lista validada pelo dia da semana de AMANHÃ: {tomorrow_weekday_str}")
+            self.trace.log(f"[VALIDAÇÃO] Lista validada pelo dia da semana de AMANHÃ: {tomorrow_weekday_str}")
             return True
 
-        print("[AVISO] A lista encontrada não parece ser para hoje nem para amanhã. Ignorando.")
+        self.trace.log("[AVISO] A lista encontrada não parece ser para hoje nem para amanhã. Ignorando.")
         return False
     
+class MultiGroupBot:
+    """
+    Vigia vários grupos com uma única sessão do WhatsApp Web (um só Chrome).
+    A cada volta lê numa chamada a prévia e as não lidas de todos os grupos na
+    lista lateral e só entra num chat quando o grupo está na janela de alerta ou
+    quando a prévia dele mudou. Cada grupo continua sendo um WhatsAppBot, com
+    horários, parsing e histórico de aberturas próprios.
+    """
+    def __init__(self, groups):
+        self.bots = [WhatsAppBot(g["group"], g.get("whatList", 1)) for g in groups]
+        self.timeZone = self.bots[0].timeZone
+        # Um trace só para todos os grupos (SIGUSR1 despeja tudo junto)
+        self.trace = self.bots[0].trace
+        for bot in self.bots:
+            bot.trace = self.trace
+            if bot.openHistory is not None and not os.getenv("OPEN_HISTORY_PATH"):
+                # Cada grupo aprende o próprio horário de abertura
+                slug = re.sub(r"[^a-z0-9]+", "_", bot.groupName.lower()).strip("_") or "grupo"
+                bot.openHistory = OpeningHistory(os.path.join(os.path.dirname(bot.openHistory.path), f"open_history_{slug}.json"))
+                bot.scheduler.history = bot.openHistory
+
+        # Espera máxima do observer no grupo em foco quando há outros grupos ativos
+        self.focusWatchTimeout = 5
+        self.openWatchTimeout = self.bots[0].openWatchTimeout
+        self.whatsapp = None
+        self.driver = None
+        self.focused = None     # WhatsAppBot cujo chat está aberto em div#main
+        self.seen = {}          # assinatura da prévia já vista por grupo
+        self.missing = set()    # grupos sem linha renderizada na lista lateral
+        self.pendingReport = False
+
+    def main(self):
+        self.open_whatsapp_web()
+        print(f"Bot em modo de vigilância 24/7 para {len(self.bots)} grupos...")
+
+        while True:
+            try:
+                wait = self.run_cycle()
+            except WebDriverException:
+                self.trace.log("Erro crítico com o WebDriver (ex: navegador fechou). Reiniciando...")
+                self.trace.flush()
+                self.handle_driver_failure()
+                wait = 0
+            except Exception as e:
+                self.trace.log(f"Ocorreu um erro inesperado no loop principal: {e}")
+                self.release_focus()
+                wait = 60
+            self.trace.mark_progress(wait)
+            if wait:
+                self.trace.flush()
+                time.sleep(wait)
+
+    def open_whatsapp_web(self):
+        self.whatsapp = Whatsapp(self.bots[0].groupName)
+        self.driver = self.whatsapp.main()
+        self._share_session()
+        self.pendingReport = True
+
+    def _share_session(self):
+        for bot in self.bots:
+            bot.whatsapp = self.whatsapp
+            bot.driver = self.driver
+            bot.inputText = None
+
+    def run_cycle(self):
+        """Uma volta por todos os grupos. Retorna quantos segundos esperar."""
+        current_time = datetime.now(self.timeZone)
+        for bot in self.bots:
+            bot.roll_day(current_time)
+
+        active = [bot for bot in self.bots if bot.is_active(current_time)]
+        if not active:
+            self.release_focus()
+            return min(bot.idle_wait(current_time) for bot in self.bots)
+
+        with self.trace.span("sidebar"):
+            previews = self.whatsapp.read_sidebar_previews([bot.groupName for bot in active])
+        target = self.pick_focus(current_time, active, previews)
+        if target is None:
+            return min(bot.scheduler.poll_interval(current_time) for bot in active)
+
+        if not self.focus(target):
+            return 5
+        self.seen[target.groupName] = previews[target.groupName]["signature"]
+
+        # Com outros grupos ativos o observer não pode prender o loop por muito tempo
+        others = [bot for bot in active if bot is not target]
+        target.openWatchTimeout = self.focusWatchTimeout if others else self.openWatchTimeout
+        wait = target.run_cycle()
+        if others:
+            wait = min([wait] + [bot.scheduler.poll_interval(current_time) for bot in others])
+        return wait
+
+    def pick_focus(self, current_time, active, previews):
+        """
+        Escolhe o grupo que merece o chat aberto: primeiro os que mudaram na lista
+        lateral, depois os que estão na janela de alerta (abertura esperada mais
+        próxima primeiro) e, por fim, o que já está aberto.
+        """
+        def distance(bot):
+            return abs((bot.scheduler.expected_open(current_time) - current_time).total_seconds())
+
+        changed = []
+        for bot in active:
+            info = previews[bot.groupName]
+            if not info["found"]:
+                if bot.groupName not in self.missing:
+                    self.missing.add(bot.groupName)
+                    self.trace.log(f"[AVISO] '{bot.groupName}' não está renderizado na lista lateral. Fixe o chat para monitorar a prévia.")
+                continue
+            self.missing.discard(bot.groupName)
+            if self.seen.get(bot.groupName) != info["signature"]:
+                changed.append(bot)
+
+        alert = [bot for bot in active if bot.scheduler.in_alert_window(current_time)]
+        for candidates in (changed, alert):
+            if candidates:
+                # Em empate fica no chat já aberto (trocar de chat custa um clique + render)
+                return min(candidates, key=lambda bot: (not bot.scheduler.in_alert_window(current_time), bot is not self.focused, distance(bot)))
+        return self.focused if self.focused in active else None
+
+    def focus(self, bot):
+        """Abre o chat de `bot`, trocando o canal de push para ele. Retorna True se ficou aberto."""
+        if self.focused is bot and bot.group_whatsapp_is_open:
+            return True
+        self.release_focus()
+        with self.trace.span("switch"):
+            opened = self.whatsapp.open_grup_whatsapp_web(bot.groupName)
+        # O clique troca o chat de forma assíncrona: log e caixa de texto ainda podem ser
+        # do grupo anterior. Só lê/escreve depois que o cabeçalho é o deste grupo.
+        if not opened or not self.whatsapp.wait_for_chat(bot.groupName, self.focusWatchTimeout):
+            return False
+        self.focused = bot
+        bot.group_whatsapp_is_open = True
+        bot.inputText = None
+        bot.armedPayload = None
+        bot.last_preview_signature = None
+        bot.start_message_feed()
+        if self.pendingReport:
+            startup_profile.report()
+            self.pendingReport = False
+        return True
+
+    def release_focus(self):
+        if self.focused is None:
+            return
+        bot = self.focused
+        bot.stop_message_feed()
+        bot.group_whatsapp_is_open = False
+        bot.inputText = None
+        # Fora do chat não vemos a virada fechado -> aberto; não registra no histórico
+        bot.last_group_open = None
+        self.focused = None
+
+    def handle_driver_failure(self):
+        bot = self.focused or self.bots[0]
+        self.release_focus()
+        bot.recover_session()
+        self.pendingReport = True
+        self.whatsapp = bot.whatsapp
+        self.driver = bot.driver
+        self._share_session()
+        if bot.group_whatsapp_is_open and self.whatsapp.is_chat_open_for(bot.groupName):
+            self.focused = bot
+        else:
+            bot.stop_message_feed()
+            bot.group_whatsapp_is_open = False
+
+class AsyncBotRuntime:
+    """
+    Runtime asyncio de um WhatsAppBot (BOT_RUNTIME=async). Em vez de um loop que
+    faz tudo em sequência, tarefas independentes conversam por eventos e fila:
+
+        schedule  janela de horário -> eventos `active`/`alert` (e pré-aquecimento)
+        watcher   caixa de texto / abertura do grupo -> fila `opened`
+        armer     resposta pré-armada enquanto o grupo está fechado
+        sender    consome `opened`, monta e envia a resposta
+        health    Chrome vivo? (porta de depuração, sem passar pelo chromedriver)
+        recovery  reconecta ou relança o navegador quando algo quebra
+        flusher   imprime os logs adiados fora do caminho crítico
+
+    Toda chamada ao driver passa por uma única thread (o WebDriver não é
+    thread-safe) com fila de prioridade: abertura, envio e recuperação passam na
+    frente do pré-armar e do pré-aquecimento, e o armer pausa assim que o watcher
+    vê o grupo abrir. Health check e flush nunca usam essa thread.
+    """
+    PRIORITY_SEND, PRIORITY_NORMAL, PRIORITY_BACKGROUND = 0, 1, 2
+
+    def __init__(self, bot, health_interval=30, flush_interval=1.0, watch_slice=5):
+        # Só quem escolhe BOT_RUNTIME=async paga o import do asyncio (~46 ms no início)
+        global asyncio
+        import asyncio, itertools, queue
+        self.bot = bot
+        self.health_interval = health_interval
+        self.flush_interval = flush_interval
+        # Fatia máxima de cada espera do observer, para o armer conseguir usar o driver
+        self.watch_slice = watch_slice
+        self.jobs = queue.PriorityQueue()
+        self.seq = itertools.count()
+        self.driver_thread = threading.Thread(target=self._driver_loop, name="driver", daemon=True)
+        self.driver_thread.start()
+
+    def start(self):
+        """Ponto de entrada síncrono: roda o runtime até ser interrompido."""
+        asyncio.run(self.run())
+
+    def _driver_loop(self):
+        while True:
+            _, _, fn, args, future = self.jobs.get()
+            if fn is None:
+                return
+            # Chamada cancelada enquanto esperava na fila: nem roda
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _submit(self, priority, fn, *args):
+        from concurrent.futures import Future
+        future = Future()
+        self.jobs.put((priority, next(self.seq), fn, args, future))
+        return asyncio.wrap_future(future)
+
+    async def run(self):
+        bot = self.bot
+        self.active = asyncio.Event()
+        self.alert = asyncio.Event()
+        self.healthy = asyncio.Event()
+        self.broken = asyncio.Event()
+        self.wake = asyncio.Event()
+        self.opened = asyncio.Queue(maxsize=1)
+        # Grupo aberto visto pelo watcher: o armer não disputa o driver com o envio
+        self.opening = asyncio.Event()
+
+        await self.call(bot.open_whatsapp_web)
+        bot.group_whatsapp_is_open = bool(await self.call(bot.whatsapp.open_grup_whatsapp_web, bot.groupName))
+        if bot.group_whatsapp_is_open:
+            await self.call(bot.start_message_feed)
+            startup_profile.report()
+        self.healthy.set()
+        print("Bot em modo de vigilância 24/7 (runtime asyncio)...")
+
+        tasks = [
+            asyncio.create_task(coro, name=coro.__name__)
+            for coro in (self.schedule(), self.watcher(), self.armer(), self.sender(),
+                         self.health(), self.recovery(), self.flusher())
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Prioridade -1: a thread sai antes de qualquer chamada ainda na fila
+            self.jobs.put((-1, next(self.seq), None, (), None))
+
+    async def call(self, fn, *args, priority=PRIORITY_NORMAL):
+        """Executa `fn` na thread do driver. WebDriverException marca a sessão como quebrada."""
+        try:
+            return await self._submit(priority, fn, *args)
+        except WebDriverException:
+            self.mark_broken()
+            raise
+
+    def mark_broken(self):
+        if self.healthy.is_set():
+            self.bot.trace.log("Erro crítico com o WebDriver (ex: navegador fechou). Reiniciando...")
+        self.healthy.clear()
+        self.broken.set()
+
+    async def _wait(self, event, timeout):
+        """Espera `event` por até `timeout` s. Retorna True se ele foi setado."""
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _guard(self, step):
+        """Roda um passo de uma tarefa; erros não derrubam as outras tarefas."""
+        try:
+            await step()
+        except WebDriverException:
+            await self.healthy.wait()
+        except Exception as e:
+            self.bot.trace.log(f"Ocorreu um erro inesperado na tarefa {asyncio.current_task().get_name()}: {e}")
+            await asyncio.sleep(60)
+
+    async def schedule(self):
+        async def step():
+            bot = self.bot
+            now = datetime.now(bot.timeZone)
+            bot.roll_day(now)
+            if not bot.is_active(now):
+                self.active.clear()
+                self.alert.clear()
+                self.wake.clear()
+                await self._wait(self.wake, bot.idle_wait(now))
+                return
+            self.active.set()
+            if bot.scheduler.in_alert_window(now):
+                self.alert.set()
+                if bot.prewarmed_date != now.date() and bot.scheduler.should_prewarm(now):
+                    bot.prewarmed_date = now.date()
+                    await self.call(bot.prewarm, priority=self.PRIORITY_BACKGROUND)
+            else:
+                self.alert.clear()
+            self.wake.clear()
+            await self._wait(self.wake, 1.0)
+        while True:
+            await self._guard(step)
+
+    async def watcher(self):
+        async def step():
+            bot = self.bot
+            await self.active.wait()
+            await self.healthy.wait()
+            if not bot.is_active(datetime.now(bot.timeZone)):
+                # Lista enviada (ou janela acabou) antes do schedule perceber
+                self.active.clear()
+                self.wake.set()
+                return
+            if not bot.group_whatsapp_is_open:
+                bot.group_whatsapp_is_open = bool(await self.call(bot.whatsapp.open_grup_whatsapp_web, bot.groupName))
+                if bot.group_whatsapp_is_open:
+                    await self.call(bot.start_message_feed)
+                else:
+                    await asyncio.sleep(50)
+                return
+
+            bot.trace.new_cycle()
+            now = datetime.now(bot.timeZone)
+            with bot.trace.span("poll"):
+                group_open = bool(await self.call(bot.is_group_open, priority=self.PRIORITY_SEND))
+            if group_open and bot.last_group_open is False and bot.openHistory is not None:
+                bot.openHistory.record(now)
+                bot.trace.log("Abertura do grupo registrada no histórico.")
+            bot.last_group_open = group_open
+            if not group_open:
+                # Alarme falso do observer: libera o armer de novo
+                self.opening.clear()
+
+            if group_open:
+                self.opening.set()
+                try:
+                    # O sender responde quanto esperar antes de olhar de novo
+                    done = asyncio.get_running_loop().create_future()
+                    await self.opened.put(done)
+                    wait = await done
+                finally:
+                    self.opening.clear()
+                await asyncio.sleep(wait)
+                return
+
+            if self.alert.is_set() and bot.eventDrivenOpen:
+                limit = min(self.watch_slice, bot.scheduler.watch_timeout(now, bot.openWatchTimeout))
+                with bot.trace.span("watch"):
+                    if await self.call(bot.whatsapp.wait_for_group_open, limit):
+                        # Pausa o armer já: a próxima chamada (poll) tem de ser a primeira da fila
+                        self.opening.set()
+                return
+            await asyncio.sleep(bot.scheduler.poll_interval(now))
+        while True:
+            await self._guard(step)
+
+    async def armer(self):
+        async def step():
+            bot = self.bot
+            await self.alert.wait()
+            await self.healthy.wait()
+            if bot.preArm and bot.last_group_open is not True and not self.opening.is_set():
+                await self.call(bot.prearm_reply, priority=self.PRIORITY_BACKGROUND)
+            await asyncio.sleep(bot.prearmInterval)
+        while True:
+            await self._guard(step)
+
+    async def sender(self):
+        while True:
+            done = await self.opened.get()
+            wait = 0
+            try:
+                wait = await self._send_once()
+            except WebDriverException:
+                wait = 0
+            except Exception as e:
+                self.bot.trace.log(f"Ocorreu um erro inesperado no envio: {e}")
+                wait = 60
+            finally:
+                if not done.done():
+                    done.set_result(wait)
+
+    async def _send_once(self):
+        """Grupo aberto: pega a resposta (pré-armada ou montada agora) e envia. Retorna a espera."""
+        bot = self.bot
+        bot.trace.log("GRUPO ABERTO! Iniciando operação em velocidade máxima.")
+        reply = await self.call(bot.take_armed_payload, priority=self.PRIORITY_SEND)
+        if reply:
+            bot.trace.log("Resposta pré-armada confere com a lista atual. Enviando direto.")
+        else:
+            reply, wait = await self.call(bot.prepare_reply_on_open, priority=self.PRIORITY_SEND)
+            if not reply:
+                self.wake.set()
+                return wait
+
+        with bot.trace.span("send") as send_span:
+            sucess = await self.call(bot.send_message_with_javascript, reply, priority=self.PRIORITY_SEND)
+        if sucess == True:
+            bot.list_sent_for_today = True
+            bot.trace.log(f"Operação concluída em {send_span['end'] - send_span['start']:.2f} segundos. Entrando em modo de espera até amanhã.")
+            self.wake.set()
+            return 0
+        bot.trace.log("Falha ao enviar a lista. Tentando novamente em breve.")
+        return bot.retryWait
+
+    async def health(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            port = self.bot.whatsapp.debugPort if self.bot.whatsapp is not None else None
+            if port is None or not self.healthy.is_set():
+                continue
+            # Fora do executor do driver: um health check lento não segura o envio
+            alive = await asyncio.to_thread(self._probe, port)
+            if not alive:
+                self.mark_broken()
+
+    @staticmethod
+    def _probe(port):
+        try:
+            with urlopen(f"http://127.0.0.1:{port}/json/version", timeout=2):
+                return True
+        except Exception:
+            return False
+
+    async def recovery(self):
+        while True:
+            await self.broken.wait()
+            self.bot.trace.flush()
+            try:
+                await self._submit(self.PRIORITY_SEND, self.bot.handle_driver_failure)
+            except Exception as e:
+                self.bot.trace.log(f"Falha ao recuperar a sessão: {e}")
+                await asyncio.sleep(60)
+                continue
+            self.broken.clear()
+            self.healthy.set()
+
+    async def flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # Em outra thread: um stdout lento não trava o loop
+            await asyncio.to_thread(self.bot.trace.flush)
+
+class CDPSession:
+    """
+    Conexão CDP direta (WebSocket) com a aba do WhatsApp, sem passar pelo chromedriver.
+    Uma thread lê o socket: respostas acordam quem chamou `send`, eventos vão para os callbacks.
+    """
+    def __init__(self, debug_port, host="127.0.0.1"):
+        self.debug_port = debug_port
+        self.host = host
+        self.ws = None
+        self._next_id = 0
+        self._pending = {}
+        self._listeners = {}
+        self._lock = threading.Lock()
+        self._reader = None
+
+    def connect(self, target_id=None, timeout=5):
+        with urlopen(f"http://{self.host}:{self.debug_port}/json", timeout=timeout) as resp:
+            targets = [t for t in json.loads(resp.read()) if t.get("type") == "page"]
+        if not targets:
+            raise RuntimeError("Nenhuma aba disponível na porta de depuração.")
+        # O handle da janela no chromedriver é o id do target no DevTools
+        target = next((t for t in targets if t.get("id") == target_id), targets[0])
+        import websocket
+        # suppress_origin: o Chrome recusa WebSockets com Origin não autorizada
+        self.ws = websocket.create_connection(target["webSocketDebuggerUrl"], timeout=timeout, suppress_origin=True)
+        self.ws.settimeout(None)
+        self._reader = threading.Thread(target=self._read_loop, name="cdp-reader", daemon=True)
+        self._reader.start()
+        return self
+
+    def on(self, event, callback):
+        self._listeners.setdefault(event, []).append(callback)
+
+    def send(self, method, params=None, timeout=5):
+        with self._lock:
+            ws = self.ws
+            if ws is None:
+                raise WebDriverException(f"CDP {method}: conexão encerrada")
+            self._next_id += 1
+            msg_id = self._next_id
+            slot = self._pending[msg_id] = [threading.Event(), None]
+            try:
+                ws.send(json.dumps({"id": msg_id, "method": method, "params": params or {}}))
+            except Exception as e:
+                # Socket fechado/quebrado: mesmo tipo de erro do chromedriver, para os fallbacks
+                self._pending.pop(msg_id, None)
+                raise WebDriverException(f"CDP {method}: {e}") from e
+        if not slot[0].wait(timeout):
+            self._pending.pop(msg_id, None)
+            raise TimeoutException(f"CDP sem resposta para {method}")
+        reply = slot[1]
+        if "error" in reply:
+            raise WebDriverException(f"CDP {method}: {reply['error'].get('message')}")
+        return reply.get("result", {})
+
+    def call_script(self, script, *args, timeout=5):
+        """
+        Equivalente ao driver.execute_script (corpo com `arguments` e `return`),
+        mas via Runtime.evaluate nesta conexão. Devolve o valor por cópia.
+        """
+        expression = f"(function(){{\n{script}\n}}).apply(null, {json.dumps(list(args))})"
+        result = self.send("Runtime.evaluate", {"expression": expression, "returnByValue": True}, timeout=timeout)
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise JavascriptException(details.get("exception", {}).get("description") or details.get("text"))
+        return result.get("result", {}).get("value")
+
+    def call_async_script(self, script, *args, timeout=5):
+        """
+        Equivalente ao driver.execute_async_script: o script recebe o callback como
+        último argumento e o Runtime.evaluate espera a Promise resolver.
+        """
+        expression = (
+            f"new Promise(done => (function(){{\n{script}\n}}).apply(null, {json.dumps(list(args))}.concat([done])))"
+        )
+        result = self.send(
+            "Runtime.evaluate", {"expression": expression, "returnByValue": True, "awaitPromise": True}, timeout=timeout
+        )
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise JavascriptException(details.get("exception", {}).get("description") or details.get("text"))
+        return result.get("result", {}).get("value")
+
+    def _read_loop(self):
+        try:
+            while True:
+                msg = json.loads(self.ws.recv())
+                if "id" in msg:
+                    slot = self._pending.pop(msg["id"], None)
+                    if slot:
+                        slot[1] = msg
+                        slot[0].set()
+                else:
+                    for callback in self._listeners.get(msg.get("method"), []):
+                        try:
+                            callback(msg.get("params", {}))
+                        except Exception as e:
+                            print(f"[AVISO] Erro no callback de {msg.get('method')}: {e}")
+        except Exception:
+            # Socket fechado (navegador caiu ou close()): libera quem estiver esperando
+            self.ws = None
+            for slot in list(self._pending.values()):
+                slot[1] = {"error": {"message": "conexão CDP encerrada"}}
+                slot[0].set()
+            self._pending.clear()
+
+    @property
+    def connected(self):
+        return self.ws is not None
+
+    def close(self):
+        ws, self.ws = self.ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+class MessageFeed:
+    """
+    Recebe as mensagens novas do chat por push (Runtime.addBinding) e mantém
+    um buffer local com as mais recentes, na ordem em que aparecem no chat.
+    """
+    def __init__(self, session, maxlen=20):
+        self.session = session
+        self.maxlen = maxlen
+        self.ready = False
+        self._messages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def install(self):
+        self.session.on("Runtime.bindingCalled", self._on_binding)
+        # Ao recarregar a página o observer some: volta para a leitura via DOM
+        self.session.on("Runtime.executionContextsCleared", self._on_context_cleared)
+        self.session.send("Runtime.enable")
+        self.session.send("Runtime.addBinding", {"name": MESSAGE_FEED_BINDING})
+        result = self.session.send("Runtime.evaluate", {
+            "expression": f"({MESSAGE_FEED_JS})({self.maxlen})",
+            "returnByValue": True,
+        })
+        if not result.get("result", {}).get("value"):
+            raise RuntimeError("Painel de mensagens (div[role=log]) não encontrado.")
+        self.ready = True
+
+    def _on_binding(self, params):
+        if params.get("name") != MESSAGE_FEED_BINDING:
+            return
+        items = json.loads(params.get("payload") or "[]")
+        if items is None:
+            # O painel saiu do DOM: buffer não vale mais, leitura volta para o snapshot
+            self.ready = False
+            with self._lock:
+                self._messages.clear()
+            return
+        # Cada push já traz as últimas `maxlen` bolhas na ordem do DOM: substitui o
+        # buffer em vez de mesclar (bolhas antigas renderizadas depois não viram "as últimas")
+        snapshot = OrderedDict()
+        for item in items[-self.maxlen:]:
+            snapshot[item.get("id") or item.get("text")] = item.get("text", "")
+        with self._lock:
+            self._messages = snapshot
+        # Painel remontado e observado de novo
+        self.ready = True
+
+    def _on_context_cleared(self, params):
+        self.ready = False
+        with self._lock:
+            self._messages.clear()
+
+    def latest(self, count=5):
+        """Texto das últimas `count` mensagens, da mais antiga para a mais nova."""
+        with self._lock:
+            return list(self._messages.values())[-count:]
+
+    def close(self):
+        self.ready = False
+        self.session.close()
+
+class ListModel:
+    """
+    Lista já processada mantida entre ciclos. Quando chega uma versão nova da
+    mensagem, compara linha a linha com a anterior (difflib) e só classifica de
+    novo as linhas que mudaram; o resto reaproveita os tokens já calculados.
+    Mesmo resultado de tokenize_list.
+    """
+    def __init__(self):
+        self.raw = None
+        self.lines = []
+        self.tokens = []    # classify_line de cada linha de self.lines
+        self.result = None
+        self.reparsed = 0   # linhas classificadas na última atualização
+
+    def update(self, raw_text):
+        if raw_text != self.raw:
+            self._apply(raw_text)
+        return self.result
+
+    def _apply(self, raw_text):
+        new_lines = raw_text.split("\n")
+        tokens = []
+        reparsed = 0
+        matcher = difflib.SequenceMatcher(None, self.lines, new_lines, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                tokens.extend(self.tokens[i1:i2])
+            else:
+                tokens.extend(classify_line(line) for line in new_lines[j1:j2])
+                reparsed += j2 - j1
+        self.raw, self.lines, self.tokens, self.reparsed = raw_text, new_lines, tokens, reparsed
+        self.result = assemble_list(new_lines, tokens)
+
+class PollScheduler:
+    """
+    Decide quanto tempo dormir entre verificações a partir das janelas configuradas:
+    dorme exatamente até a próxima janela, aperta o intervalo conforme o horário
+    esperado de abertura se aproxima e volta a espaçar depois que ele passa.
+    """
+    def __init__(self, timeZone, days_to_run, run_start, run_end, alert_start, alert_end,
+                 min_interval=0.7, max_interval=20.0, alert_max_interval=1.5,
+                 ramp_seconds=600, backoff_seconds=1800, max_sleep=1800):
+        self.timeZone = timeZone
+        self.days_to_run = days_to_run
+        self.run_start = dtime(*run_start)
+        self.run_end = dtime(*run_end)
+        self.alert_start = dtime(*alert_start)
+        self.alert_end = dtime(*alert_end)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        # Dentro da janela de alerta nunca espaça mais que isso
+        self.alert_max_interval = alert_max_interval
+        # Janela (s) em que o intervalo vai de max_interval até min_interval antes da abertura
+        self.ramp_seconds = ramp_seconds
+        # Tempo (s) após a abertura esperada para o intervalo voltar a max_interval
+        self.backoff_seconds = backoff_seconds
+        # Teto de cada sono longo, para o loop reavaliar o estado de tempos em tempos
+        self.max_sleep = max_sleep
+        # OpeningHistory opcional: com amostras suficientes, amplia a janela fixa e dá a abertura esperada
+        self.history = None
+        # Acorda esse tanto (s) antes da abertura esperada para pré-aquecer
+        self.prewarm_lead = 0
+
+    def _at(self, now, t):
+        return datetime.combine(now.date(), t, tzinfo=now.tzinfo or self.timeZone)
+
+    def in_run_window(self, now):
+        return self.run_start <= now.timetz().replace(tzinfo=None) < self.run_end
+
+    def alert_window(self, now):
+        """(início, fim, abertura esperada) da janela de alerta no dia de `now`."""
+        prediction = self.history.predict(now.weekday()) if self.history is not None else None
+        if prediction is None:
+            return self.alert_start, self.alert_end, self.alert_start
+        start, end, expected = prediction
+        # União com a janela configurada: uma abertura fora do padrão aprendido
+        # ainda cai em modo de alerta. Nunca sai da janela de execução.
+        start, end = min(start, self.alert_start), max(end, self.alert_end)
+        return max(start, self.run_start), min(end, self.run_end), expected
+
+    def in_alert_window(self, now):
+        start, end, _ = self.alert_window(now)
+        return start <= now.timetz().replace(tzinfo=None) < end
+
+    def expected_open(self, now):
+        """Horário esperado de abertura do grupo no dia de `now`."""
+        return self._at(now, self.alert_window(now)[2])
+
+    def should_prewarm(self, now):
+        """True a partir de `prewarm_lead` segundos antes da abertura esperada."""
+        return (self.expected_open(now) - now).total_seconds() <= self.prewarm_lead
+
+    def seconds_until_next_run(self, now, sent_today=False):
+        """Segundos até o início da próxima janela de execução válida (limitado a max_sleep)."""
+        for offset in range(0, 8):
+            day = now + timedelta(days=offset)
+            if offset == 0 and sent_today:
+                continue
+            if day.weekday() not in self.days_to_run:
+                continue
+            start = self._at(day, self.run_start)
+            if offset == 0 and now >= self._at(day, self.run_end):
+                continue
+            wait = max(0.0, (start - now).total_seconds())
+            # Já dentro da janela (ex.: esperando o dia virar): reavalia em breve
+            return min(wait if wait > 0 else self.max_interval, self.max_sleep)
+        return self.max_sleep
+
+    def poll_interval(self, now):
+        """
+        Intervalo até a próxima verificação com o grupo fechado. Fica em max_interval
+        longe da abertura, cai linearmente até min_interval ao chegar nela e depois
+        cresce de volta. Nunca dorme além do início da janela de alerta e, dentro
+        dela, nunca passa de alert_max_interval.
+        """
+        delta = (self.expected_open(now) - now).total_seconds()
+        if delta >= 0:
+            fraction = min(1.0, delta / self.ramp_seconds)
+        else:
+            fraction = min(1.0, -delta / self.backoff_seconds)
+        interval = self.min_interval + (self.max_interval - self.min_interval) * fraction
+        # Jitter para não verificar em intervalos idênticos, sem passar de max_interval
+        interval = min(self.max_interval, interval * random.uniform(0.8, 1.2))
+
+        if delta > self.prewarm_lead:
+            interval = min(interval, delta - self.prewarm_lead)
+        elif delta > 0:
+            interval = min(interval, delta)
+        if self.in_alert_window(now):
+            interval = min(interval, self.alert_max_interval)
+        return max(self.min_interval * 0.8, interval)
+
+    def watch_timeout(self, now, limit):
+        """Tempo máximo de uma espera bloqueante, sem passar do fim da janela de alerta."""
+        remaining = (self._at(now, self.alert_window(now)[1]) - now).total_seconds()
+        until_prewarm = (self.expected_open(now) - now).total_seconds() - self.prewarm_lead
+        if until_prewarm > 0:
+            remaining = min(remaining, until_prewarm)
+        return max(1.0, min(limit, remaining))
+
+class OpeningHistory:
+    """
+    Histórico local (JSON) dos momentos em que o grupo abriu. A partir da
+    distribuição prevê a janela de alerta e o horário esperado de abertura.
+    """
+    def __init__(self, path, max_entries=60, min_samples=3, margin_minutes=10):
+        self.path = path
+        self.max_entries = max_entries
+        self.min_samples = min_samples
+        self.margin = margin_minutes * 60
+        self.entries = []
+        self._cache = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = []
+        except (OSError, ValueError) as e:
+            print(f"[AVISO] Histórico de aberturas ilegível ({self.path}): {e}")
+            self.entries = []
+
+    def record(self, when):
+        self.entries.append({
+            "at": when.isoformat(timespec="seconds"),
+            "weekday": when.weekday(),
+            "second_of_day": when.hour * 3600 + when.minute * 60 + when.second,
+        })
+        self.entries = self.entries[-self.max_entries:]
+        self._cache.clear()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"[AVISO] Não foi possível salvar o histórico de aberturas: {e}")
+
+    def predict(self, weekday):
+        """
+        (início, fim, abertura esperada) como `datetime.time`, ou None sem amostras suficientes.
+        Usa só o mesmo dia da semana quando há amostras suficientes dele.
+        """
+        if weekday not in self._cache:
+            same_day = [e["second_of_day"] for e in self.entries if e["weekday"] == weekday]
+            samples = same_day if len(same_day) >= self.min_samples else [e["second_of_day"] for e in self.entries]
+            self._cache[weekday] = self._window(sorted(samples)) if len(samples) >= self.min_samples else None
+        return self._cache[weekday]
+
+    def _window(self, samples):
+        quantile = lambda q: samples[int(round(q * (len(samples) - 1)))]
+        return (
+            self._as_time(quantile(0.1) - self.margin),
+            self._as_time(quantile(0.9) + self.margin),
+            self._as_time(quantile(0.5)),
+        )
+
+    @staticmethod
+    def _as_time(second_of_day):
+        second_of_day = int(min(max(second_of_day, 0), 86399))
+        hours, rest = divmod(second_of_day, 3600)
+        return dtime(hours, *divmod(rest, 60))
+
+class CycleTrace:
+    """
+    Spans leves por etapa do ciclo (poll, scroll, extract, parse, rebuild, send):
+    timestamps monotônicos num ring buffer limitado, com dump em JSONL sob demanda.
+    Os logs também vão para o buffer e só são formatados/impressos em `flush`.
+    """
+    def __init__(self, timeZone=None, maxlen=5000):
+        self.timeZone = timeZone
+        self.records = deque(maxlen=maxlen)
+        self.cycle = 0
+        self._pending = []
+        # Fim da última volta do loop principal (monotônico) e a espera planejada
+        # depois dela: é o que o supervisor usa para saber se o loop travou
+        self.progress_at = None
+        self.progress_wait = 0.0
+
+    def new_cycle(self):
+        self.cycle += 1
+
+    def mark_progress(self, wait):
+        self.progress_at = time.monotonic()
+        self.progress_wait = wait or 0.0
+
+    @contextmanager
+    def span(self, stage):
+        record = {"cycle": self.cycle, "stage": stage, "start": time.monotonic(), "end": None}
+        try:
+            yield record
+        finally:
+            record["end"] = time.monotonic()
+            self.records.append(record)
+
+    def log(self, message):
+        # Guarda só o epoch; o strftime fica para o flush
+        record = {"cycle": self.cycle, "stage": "log", "start": time.monotonic(), "wall": time.time(), "message": message}
+        self.records.append(record)
+        self._pending.append(record)
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        for record in pending:
+            stamp = datetime.fromtimestamp(record["wall"], self.timeZone).strftime('%H:%M:%S')
+            print(f"[{stamp}] {record['message']}")
+
+    def stats(self, window=500):
+        """Duração (ms) por etapa nos últimos `window` spans: última, p50, p95 e n."""
+        try:
+            recent = list(self.records)[-window:]
+        except RuntimeError:
+            # Buffer alterado por outra thread durante a cópia; fica para a próxima
+            return {}
+        durations = {}
+        for record in recent:
+            if record["stage"] != "log" and record["end"] is not None:
+                durations.setdefault(record["stage"], []).append((record["end"] - record["start"]) * 1000)
+        summary = {}
+        for stage, values in durations.items():
+            ordered = sorted(values)
+            rank = lambda pct: ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+            summary[stage] = {"last": values[-1], "p50": rank(50), "p95": rank(95), "n": len(values)}
+        return summary
+
+    def dump_jsonl(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for record in list(self.records):
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"[INFO] {len(self.records)} registros de trace salvos em {path}")
+
+class StartupProfile:
+    """
+    Mede as fases até o bot ficar pronto (imports, driver, Chrome, página, login,
+    grupo). Com STARTUP_PROFILE=1 imprime o relatório a cada vez que fica pronto,
+    inclusive depois de um reinício. Para o detalhe dos imports: python -X importtime.
+    """
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.origin = _STARTUP_T0
+        self.phases = [("imports", _STARTUP_T0, _IMPORTS_DONE)]
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        if self.origin is None:
+            self.origin = start
+        try:
+            yield
+        finally:
+            self.phases.append((name, start, time.perf_counter()))
+
+    def report(self):
+        if not self.phases:
+            return
+        if self.enabled:
+            total = time.perf_counter() - self.origin
+            print("[STARTUP] Tempo até ficar pronto:")
+            for name, start, end in self.phases:
+                print(f"[STARTUP]   {name:<16} {end - start:8.3f}s  (em {start - self.origin:8.3f}s)")
+            print(f"[STARTUP]   {'total':<16} {total:8.3f}s")
+        # O próximo reinício é medido do zero
+        self.origin = None
+        self.phases = []
+
+startup_profile = StartupProfile(os.getenv("STARTUP_PROFILE") == "1")
+
 class Whatsapp:
     def __init__ (self, groupName):
         self.groupName = groupName
         self.driver = None
+        self.debugPort = None
+        self.driverPath = None
+        self.url = os.getenv("WHATSAPP_URL", "https://web.whatsapp.com/")
+        # "default" ou "lean" (ver LEAN_CHROME_FLAGS)
+        self.launchProfile = os.getenv("CHROME_PROFILE", "default")
+        # BLOCK_MEDIA=1 -> não baixa mídia; MEDIA_ALLOWLIST="pps.whatsapp.net" libera hosts
+        # (nomes de host, aceita *: "*.whatsapp.net"). O bloqueio é por padrão inteiro:
+        # uma entrada só libera um padrão que ela cobre por completo
+        # ("media-gru1-1.cdn.whatsapp.net" não libera "media*.cdn.whatsapp.net")
+        self.blockMedia = os.getenv("BLOCK_MEDIA", "0") == "1"
+        self.mediaAllowlist = [a.strip() for a in os.getenv("MEDIA_ALLOWLIST", "").split(",") if a.strip()]
+        # Script timeout (s) da sessão: folga sobre a maior espera do observer de abertura
+        self.scriptTimeout = 90
         
     def main(self):
         print("[DEBUG] Iniciando Drivers")
+        if self.adopt_leftover_browser():
+            # Aba já carregada pelo reattach(): só confere o login
+            self.abrir_whatsapp_web(reload=False)
+            return self.driver
         self.inicializar_driver_stealth()
         print("[DEBUG] Iniciando o método Whatsapp.main...")
         self.abrir_whatsapp_web()
         return self.driver 
     
-    def open_grup_whatsapp_web (self):
-        if self.abrir_grupo():
-            print(f"Grupo '{self.groupName}' aberto com sucesso.")
+    def open_grup_whatsapp_web (self, groupName=None):
+        groupName = groupName or self.groupName
+        with startup_profile.phase("open_group"):
+            opened = self.abrir_grupo(groupName=groupName)
+        if opened:
+            print(f"Grupo '{groupName}' aberto com sucesso.")
             return self.driver
         else:
-            print(f"Falha ao abrir o grupo '{self.groupName}'.")
+            print(f"Falha ao abrir o grupo '{groupName}'.")
+            return False
+
+    def read_sidebar_previews(self, names):
+        """
+        Prévia da última mensagem e não lidas de cada grupo em `names`, lidas da
+        lista lateral sem entrar em nenhum chat. Retorna {nome: {...}}.
+        """
+        return json.loads(self.driver.execute_script(SIDEBAR_PREVIEWS_JS, list(names)))
+
+    def _chat_header(self):
+        try:
+            return json.loads(self.driver.execute_script(CHAT_HEADER_JS))
+        except WebDriverException:
+            return {"main": False, "header": False, "title": None, "text": None}
+
+    def current_chat_title(self):
+        """Título do chat aberto em div#main (None se nenhum): atributo title ou 1ª linha do cabeçalho."""
+        info = self._chat_header()
+        if info["title"]:
+            return info["title"]
+        lines = (info["text"] or "").strip().splitlines()
+        return lines[0].strip() if lines else None
+
+    def is_chat_open_for(self, groupName):
+        """
+        True se div#main mostra `groupName`. Sem atributo title no cabeçalho, procura o
+        nome no texto dele; sem cabeçalho reconhecível, volta à checagem antiga (div#main).
+        """
+        info = self._chat_header()
+        if info["title"]:
+            return info["title"] == groupName
+        if info["text"]:
+            return groupName in [line.strip() for line in info["text"].splitlines()]
+        return info["main"] and not info["header"]
+
+    def wait_for_chat(self, groupName, timeout=5):
+        """Espera o cabeçalho de div#main mostrar `groupName`. True se apareceu a tempo."""
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(
+                lambda _: self.is_chat_open_for(groupName)
+            )
+            return True
+        except TimeoutException:
             return False
 
     def inicializar_driver_stealth(self):
@@ -420,7 +2196,7 @@ class Whatsapp:
             options = webdriver.ChromeOptions()
 
             # Perfil: do ENV ou padrão persistente
-            data_dir = os.path.abspath(os.getenv("CHROME_USER_DATA_DIR", "./whatsapp_session_data"))
+            data_dir = self._user_data_dir()
             self._prepare_user_data_dir(data_dir)
             options.add_argument(f"--user-data-dir={data_dir}")
             options.add_argument("--profile-directory=Default")
@@ -431,7 +2207,11 @@ class Whatsapp:
             
             options.add_argument("--no-sandbox")
             options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--window-size=1920,1080")
+            if self.launchProfile == "lean":
+                for flag in LEAN_CHROME_FLAGS:
+                    options.add_argument(flag)
+            else:
+                options.add_argument("--window-size=1920,1080")
             options.set_capability('goog:loggingPrefs', {'browser': 'ALL'})
             # -------------------------------------
 
@@ -443,70 +2223,389 @@ class Whatsapp:
             options.add_argument("--no-default-browser-check")
             options.add_argument("--disable-gpu")
 
-            # Evita colisão se houver outro Chrome vivo usando a porta padrão:
-            options.add_argument(f"--remote-debugging-port={9222 + random.randint(0,999)}")
-
-            service = ChromeService(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
-            try:
-                driver.maximize_window()
-            except Exception:
-                pass
+            # Porta determinística (CHROME_DEBUG_PORT) ou a primeira livre a partir de 9222
+            self.debugPort = self._pick_debug_port()
+            if self._browser_pids():
+                # Sobra de outra execução na porta fixa: o lançamento novo não conseguiria usá-la
+                print(f"[AVISO] Encerrando o Chrome que ainda ocupava a porta {self.debugPort}.")
+                self.close_browser()
+            options.add_argument(f"--remote-debugging-port={self.debugPort}")
+            # Mantém o Chrome vivo se o chromedriver cair, para reattach() reaproveitá-lo
+            options.add_experimental_option("detach", True)
+
+            with startup_profile.phase("driver_resolve"):
+                self.driverPath = self._resolve_chromedriver()
+            with startup_profile.phase("chrome_launch"):
+                service = ChromeService(self.driverPath)
+                driver = webdriver.Chrome(service=service, options=options)
+            if self.launchProfile != "lean":
+                try:
+                    driver.maximize_window()
+                except Exception:
+                    pass
 
             self.driver = driver
+            self.apply_script_timeout()
+            self.apply_network_policy()
             return driver
         except Exception as e:
             print(f"Erro ao iniciar o Chrome Driver com webdriver-manager: {e}")
             return None
 
-    def abrir_whatsapp_web(self, timeout=90):
+    def _user_data_dir(self):
+        return os.path.abspath(os.getenv("CHROME_USER_DATA_DIR", "./whatsapp_session_data"))
+
+    def adopt_leftover_browser(self):
+        """
+        Procura um Chrome que ficou aberto (detach=True) com o nosso perfil, de uma
+        execução anterior que não o fechou. Se ele ainda responde, reaproveita com
+        reattach(); senão, fecha, para liberar o perfil e a porta do lançamento novo.
+        Retorna True se a sessão reaproveitada estiver pronta.
+        """
+        port = self._leftover_debug_port(self._user_data_dir())
+        if port is None:
+            return False
+        self.debugPort = port
+        with startup_profile.phase("driver_resolve"):
+            self.driverPath = self._resolve_chromedriver()
+        if self.reattach():
+            print(f"[INFO] Reaproveitando o Chrome que já estava aberto na porta {port}.")
+            return True
+        print(f"[AVISO] Chrome anterior na porta {port} não respondeu; encerrando antes de relançar.")
+        self.close_browser()
+        self.debugPort = None
+        return False
+
+    def _leftover_debug_port(self, data_dir):
+        """Porta de depuração de um Chrome já rodando com `data_dir` como perfil (None se nenhum)."""
+        profile = f"--user-data-dir={data_dir}".encode()
+        for _, args in self._proc_cmdlines():
+            if profile not in args:
+                continue
+            for arg in args:
+                if arg.startswith(b"--remote-debugging-port="):
+                    return int(arg.split(b"=", 1)[1])
+        return None
+
+    def _pick_debug_port(self, base=9222, span=1000):
+        """
+        Porta de depuração remota do Chrome. CHROME_DEBUG_PORT fixa a porta (o
+        supervisor atribui uma por conta); sem ela usa a primeira livre a partir de `base`.
+        """
+        fixed = os.getenv("CHROME_DEBUG_PORT")
+        if fixed:
+            return int(fixed)
+        for port in range(base, base + span):
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                if sock.connect_ex(("127.0.0.1", port)) != 0:
+                    return port
+        raise RuntimeError(f"Nenhuma porta livre para depuração entre {base} e {base + span - 1}.")
+
+    def media_block_patterns(self):
+        """
+        Padrões de MEDIA_BLOCK_PATTERNS menos os que alguma entrada da allowlist cobre
+        por inteiro: o host do padrão (com o seu *) tem de casar com o glob da entrada.
+        """
+        def host(pattern):
+            return pattern.split("://", 1)[-1].split("/", 1)[0]
+        patterns, used = [], set()
+        for p in MEDIA_BLOCK_PATTERNS:
+            covering = [a for a in self.mediaAllowlist if fnmatch.fnmatchcase(host(p), a.lower())]
+            used.update(covering)
+            if not covering:
+                patterns.append(p)
+        for allowed in self.mediaAllowlist:
+            if allowed not in used:
+                print(f"[AVISO] MEDIA_ALLOWLIST '{allowed}' não cobre nenhum padrão inteiro; nada foi liberado.")
+        return patterns
+
+    def apply_script_timeout(self):
+        """
+        Script timeout da sessão, definido uma vez: cobre a maior espera assíncrona
+        (observer de abertura) e poupa um round trip antes de cada script.
+        """
+        self.driver.set_script_timeout(self.scriptTimeout)
+
+    def apply_network_policy(self):
+        """Com BLOCK_MEDIA=1, impede via CDP que o Chrome baixe imagens, vídeos, figurinhas e avatares."""
+        if not self.blockMedia:
+            return
+        patterns = self.media_block_patterns()
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+            print(f"[DEBUG] Bloqueio de mídia ativo ({len(patterns)} padrões).")
+        except Exception as e:
+            print(f"[AVISO] Não foi possível ativar o bloqueio de mídia: {e}")
+
+    def _resolve_chromedriver(self):
+        """
+        Caminho do chromedriver sem consultar o webdriver-manager a cada início:
+        reaproveita o manifesto em WDM_CACHE_DIR e só resolve de novo quando a
+        versão major do Chrome muda (ou o binário sumiu).
+        """
+        explicit = os.getenv("CHROMEDRIVER_PATH")
+        if explicit:
+            return explicit
+
+        # O import do webdriver-manager sozinho custa ~150 ms: só nos ramos que chamam install()
+        if os.getenv("PINNED_DRIVER", "1") != "1":
+            from webdriver_manager.chrome import ChromeDriverManager
+            return ChromeDriverManager().install()
+
+        cache_dir = os.getenv("WDM_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".wdm"))
+        manifest_path = os.path.join(cache_dir, "chromedriver_manifest.json")
+        chrome_version = self._chrome_version()
+        chrome_major = chrome_version.split(".")[0] if chrome_version else None
+
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            same_chrome = chrome_major is None or manifest.get("chrome_major") == chrome_major
+            if same_chrome and os.path.isfile(manifest.get("path", "")):
+                return manifest["path"]
+            print(f"[INFO] Chrome mudou ({manifest.get('chrome_major')} -> {chrome_major}). Resolvendo chromedriver de novo...")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"[AVISO] Manifesto do chromedriver ilegível: {e}")
+
+        from webdriver_manager.chrome import ChromeDriverManager
+        path = ChromeDriverManager().install()
+        manifest = {
+            "path": path,
+            "chrome_version": chrome_version,
+            "chrome_major": chrome_major,
+            "resolved_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+        except OSError as e:
+            print(f"[AVISO] Não foi possível salvar o manifesto do chromedriver: {e}")
+        return path
+
+    def _chrome_version(self):
+        """Versão do Chrome instalado (ex.: '129.0.6668.89') ou None se não der para descobrir."""
+        candidates = [os.getenv("CHROME_BINARY"), "google-chrome", "google-chrome-stable", "chromium", "chromium-browser"]
+        for name in filter(None, candidates):
+            binary = shutil.which(name)
+            if not binary:
+                continue
+            try:
+                out = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=10).stdout
+            except (OSError, subprocess.SubprocessError):
+                continue
+            match = re.search(r"(\d+\.\d+\.\d+\.\d+)", out)
+            if match:
+                return match.group(1)
+        return None
+
+    def abrir_whatsapp_web(self, timeout=90, reload=True):
         if self.driver is None:
             print("Driver não inicializado. Não é possível abrir o WhatsApp Web.")
             return
 
-        self.driver.get("https://web.whatsapp.com/")
-        WebDriverWait(self.driver, timeout).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "div#app"))
-        )
+        # WHATSAPP_URL permite apontar para o fixture local (tools/fake_whatsapp.py)
+        with startup_profile.phase("page_load"):
+            if reload:
+                self.driver.get(self.url)
+            WebDriverWait(self.driver, timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "div#app"))
+            )
         print("WhatsApp Web carregado.")
 
         if not self._logged_in():
             print("[INFO] Aguardando autenticação via QR...")
-            ok = self._ensure_login_with_qr_updates(refresh_each=25, max_wait=300)
+            with startup_profile.phase("qr_login"):
+                ok = self._ensure_login_with_qr_updates(refresh_each=25, max_wait=300)
             if not ok:
                 raise RuntimeError("Não foi possível autenticar no WhatsApp a tempo.")
 
-    def abrir_grupo(self, timeout=25):
+    def abrir_grupo(self, timeout=25, groupName=None):
+        groupName = groupName or self.groupName
         try:
-            xp = f"//span[@dir='auto' and @title='{self.groupName}']"
+            xp = f"//span[@dir='auto' and @title='{groupName}']"
             el = WebDriverWait(self.driver, timeout).until(EC.element_to_be_clickable((By.XPATH, xp)))
             
             print(el)
             
             el.click()
-            WebDriverWait(self.driver, timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div#main")))
+            # div#main continua lá com o chat anterior; só vale quando o cabeçalho já é o deste grupo
+            if not self.wait_for_chat(groupName, timeout):
+                print(f"Cliquei em '{groupName}', mas o chat não abriu em div#main.")
+                return False
             
             print("Grupo aberto.")
             
             return True
         except TimeoutException:
-            print(f"Não achei '{self.groupName}' na lateral. Confirme o nome exato (título do span).")
+            print(f"Não achei '{groupName}' na lateral. Confirme o nome exato (título do span).")
             return False
 
-    def _scroll_to_end(self):
-        """Rola para baixo para garantir que a última mensagem seja carregada/visível."""
+    def reattach(self, timeout=15):
+        """
+        Cria uma nova sessão do chromedriver presa ao Chrome já aberto (porta de
+        depuração), sem relançar o navegador nem recarregar o WhatsApp quando possível.
+        Retorna True se a sessão estiver pronta para uso.
+        """
+        if self.debugPort is None or self.driverPath is None:
+            return False
         try:
-            # Tenta pegar o elemento que contém o painel principal de mensagens
-            main_chat_panel_xpath = '//div[@role="log"]' 
-            chat_panel = WebDriverWait(self.driver, 3).until(
-                EC.presence_of_element_located((By.XPATH, main_chat_panel_xpath))
-            )
-            
-            # Executa JavaScript para rolar até o final
-            self.driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", chat_panel)
-            print("[DEBUG] Rolagem forçada para o fim da conversa.")
-            time.sleep(1) # Pequena pausa para o WhatsApp Web renderizar
+            # Chrome ainda responde na porta de depuração?
+            with urlopen(f"http://127.0.0.1:{self.debugPort}/json/version", timeout=2):
+                pass
+        except Exception:
+            return False
+
+        # O chromedriver antigo não serve mais; sem isso sobraria um processo por reconexão
+        self._stop_driver_service()
+
+        try:
+            options = webdriver.ChromeOptions()
+            options.add_experimental_option("debuggerAddress", f"127.0.0.1:{self.debugPort}")
+            driver = webdriver.Chrome(service=ChromeService(self.driverPath), options=options)
+
+            # Volta para a aba do WhatsApp
+            for handle in driver.window_handles:
+                driver.switch_to.window(handle)
+                if driver.current_url.startswith(self.url.rstrip("/")):
+                    break
+            else:
+                driver.get(self.url)
+
+            try:
+                WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div#app")))
+            except TimeoutException:
+                # Aba travada: recarrega no mesmo navegador, ainda bem mais barato que relançar
+                driver.get(self.url)
+                WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div#app")))
+
+            self.driver = driver
+            self.apply_script_timeout()
+            # O bloqueio vale por sessão CDP: a sessão nova precisa dele de novo
+            self.apply_network_policy()
             return True
+        except Exception as e:
+            print(f"[AVISO] Falha ao reconectar ao Chrome existente: {e}")
+            return False
+
+    def is_chat_open(self):
+        try:
+            return bool(self.driver.find_elements(By.CSS_SELECTOR, "div#main"))
+        except WebDriverException:
+            return False
+
+    def shutdown(self):
+        """Encerra o navegador atual (antes de um reinício completo)."""
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self._stop_driver_service()
+            self.driver = None
+        # Com detach=True o quit() num chromedriver morto não fecha o Chrome, que
+        # continuaria segurando o perfil e a porta de depuração do próximo lançamento
+        self.close_browser()
+
+    def _stop_driver_service(self):
+        """Encerra o processo do chromedriver da sessão atual (o Chrome fica: detach)."""
+        service = getattr(self.driver, "service", None)
+        if service is None:
+            return
+        try:
+            service.stop()
+        except Exception:
+            pass
+
+    def _proc_cmdlines(self):
+        """(pid, argumentos) de cada processo visível em /proc (nada fora do Linux)."""
+        if not os.path.isdir("/proc"):
+            return
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/cmdline", "rb") as f:
+                    yield int(entry), f.read().split(b"\0")
+            except (FileNotFoundError, ProcessLookupError, PermissionError):
+                continue
+
+    def _browser_pids(self):
+        """PIDs do Chrome lançado com a nossa porta de depuração (via /proc; vazio fora do Linux)."""
+        if self.debugPort is None:
+            return []
+        flag = f"--remote-debugging-port={self.debugPort}".encode()
+        return [pid for pid, args in self._proc_cmdlines() if flag in args]
+
+    def close_browser(self, timeout=5):
+        """
+        Fecha o Chrome da porta de depuração sem depender do chromedriver:
+        Browser.close pelo WebSocket do navegador e, se algum processo continuar
+        vivo depois de `timeout` s, mata pela porta (como o supervisor faz).
+        """
+        if self.debugPort is None:
+            return
+        try:
+            with urlopen(f"http://127.0.0.1:{self.debugPort}/json/version", timeout=2) as resp:
+                ws_url = json.loads(resp.read())["webSocketDebuggerUrl"]
+            import websocket
+            ws = websocket.create_connection(ws_url, timeout=2, suppress_origin=True)
+            try:
+                ws.send(json.dumps({"id": 1, "method": "Browser.close"}))
+            finally:
+                ws.close()
+        except Exception:
+            # Porta já fechada (navegador morto) ou travado: sobra a varredura abaixo
+            pass
+        deadline = time.monotonic() + timeout
+        while self._browser_pids() and time.monotonic() < deadline:
+            time.sleep(0.2)
+        for pid in self._browser_pids():
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    def open_cdp_session(self):
+        """Abre uma conexão CDP direta com a aba controlada pelo Selenium."""
+        return CDPSession(self.debugPort).connect(target_id=self.driver.current_window_handle)
+
+    def wait_for_group_open(self, timeout=60):
+        """
+        Bloqueia numa única chamada assíncrona até a caixa de texto do grupo ficar
+        editável. Retorna True assim que o grupo abrir, False se o tempo acabar.
+        """
+        # O script timeout da sessão (apply_script_timeout) precisa de folga sobre o interno
+        timeout = min(timeout, self.scriptTimeout - 5)
+        try:
+            return bool(self.driver.execute_async_script(WAIT_GROUP_OPEN_JS, int(timeout * 1000)))
+        except (TimeoutException, JavascriptException) as e:
+            # Página recarregou ou o script estourou: volta para o polling normal
+            print(f"[AVISO] Observer de abertura do grupo interrompido: {e}")
+            return False
+
+    def _scroll_to_end(self, check_ms=30, timeout=1.0):
+        """
+        Rola para baixo para garantir que a última mensagem seja carregada/visível.
+        Em vez da pausa fixa de 1 s, volta assim que a vista chega ao fim com a
+        última bolha visível (no máximo `timeout` s). Já no fim, nem rola.
+        """
+        try:
+            result = self.driver.execute_async_script(SCROLL_TO_END_JS, check_ms, int(timeout * 1000))
+            if result == "missing":
+                # Chat ainda montando: espera o painel de mensagens e tenta de novo
+                WebDriverWait(self.driver, 3).until(
+                    EC.presence_of_element_located((By.XPATH, '//div[@role="log"]'))
+                )
+                result = self.driver.execute_async_script(SCROLL_TO_END_JS, check_ms, int(timeout * 1000))
+            if result == "timeout":
+                print("[AVISO] O chat não assentou a tempo depois da rolagem; lendo assim mesmo.")
+            elif result == "rendered":
+                print("[DEBUG] Rolagem forçada para o fim da conversa.")
+            return result != "missing"
         except Exception as e:
             print(f"[AVISO] Falha ao rolar para o final: {e}")
             return False
@@ -610,6 +2709,8 @@ class Whatsapp:
         Salva o arquivo .png como um fallback.
         Para quando detectar login ou quando o tempo máximo for atingido.
         """
+        import qrcode # Só é necessário quando a sessão não está logada
+
         qr_path = os.getenv("QR_OUTPUT_PATH", "/shared/qr.png")
         start_time = time.time()
         last_qr_data = None 
@@ -664,12 +2765,27 @@ class Whatsapp:
 
 if __name__ == "__main__":
     # "VAN INTEGRAL 2025"
-    bot = WhatsAppBot("VAN INTEGRAL 2025")
+    # BOT_GROUPS='[{"group": "VAN INTEGRAL 2025", "whatList": 1}, {"group": "Outra Van", "whatList": 0}]'
+    # vigia vários grupos com um único Chrome
+    groups = json.loads(os.getenv("BOT_GROUPS", "[]"))
+    bot = MultiGroupBot(groups) if groups else WhatsAppBot("VAN INTEGRAL 2025")
+    # BOT_RUNTIME=async -> tarefas asyncio independentes (só para um grupo)
+    use_async = os.getenv("BOT_RUNTIME", "sync") == "async" and not groups
+    # `kill -USR1 <pid>` salva os spans recentes em JSONL
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda *_: bot.trace.dump_jsonl(os.getenv("TRACE_PATH", "trace_spans.jsonl")))
     try:
-        bot.main()
+        if use_async:
+            AsyncBotRuntime(bot).start()
+        else:
+            bot.main()
     except Exception as e:
         print(f"Uma exceção não tratada ocorreu: {e}")
     finally:
-        if bot.driver:
+        if bot.whatsapp is not None:
+            # Com detach=True o driver.quit() não fecha o Chrome: shutdown() fecha os dois
+            print("Encerrando o driver do Selenium e o Chrome para garantir um desligamento limpo...")
+            bot.whatsapp.shutdown()
+        elif bot.driver:
             print("Encerrando o driver do Selenium para garantir um desligamento limpo...")
             bot.driver.quit()
\ No newline at end of file
@@ -0,0 +1,351 @@
+"""
+Supervisor de várias contas: um processo (bot isolado) por conta, cada um com o
+seu CHROME_USER_DATA_DIR e uma porta de depuração fixa (--base-port + índice),
+em vez de portas aleatórias que podem colidir.
+
+    python supervisor.py --config accounts.json --stagger 30 --http-port 8090
+
+accounts.json (uma conta = um perfil do Chrome; "groups" usa o MultiGroupBot):
+
+    [
+      {"name": "helio", "user_data_dir": "./sessions/helio", "group": "VAN INTEGRAL 2025", "whatList": 1},
+      {"name": "ana", "user_data_dir": "./sessions/ana",
+       "groups": [{"group": "Van A"}, {"group": "Van B", "whatList": 0}],
+       "env": {"QR_OUTPUT_PATH": "/shared/qr_ana.png", "CHROME_PROFILE": "lean"}}
+    ]
+
+- Inícios a frio escalonados: nunca sobe um Chrome a menos de --stagger s do anterior.
+- Worker que morre, para de mandar heartbeat ou cujo loop principal para de
+  avançar (última volta + espera planejada + --heartbeat-timeout) é reiniciado
+  com backoff exponencial; antes disso o Chrome órfão da porta dele é encerrado.
+- Cada worker manda um heartbeat com estado dos grupos e latências por etapa
+  (CycleTrace.stats). O supervisor junta tudo em --status (JSON) e, com
+  --http-port, em GET /health.
+"""
+import argparse, json, multiprocessing, os, queue, signal, sys, threading, time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def run_worker(account, debug_port, heartbeats, heartbeat_every):
+    """Ponto de entrada do processo worker: configura o ambiente da conta e roda o bot."""
+    os.environ.update({key: str(value) for key, value in account.get("env", {}).items()})
+    os.environ["CHROME_USER_DATA_DIR"] = os.path.abspath(account["user_data_dir"])
+    os.environ["CHROME_DEBUG_PORT"] = str(debug_port)
+    # SIGTERM do supervisor vira SystemExit para o finally fechar o Chrome
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    # Ctrl+C no terminal chega ao grupo todo: quem encerra os workers é o supervisor
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Importado só aqui: o main_v11 lê o ambiente ao ser carregado
+    import main_v11
+
+    if "groups" in account:
+        bot = main_v11.MultiGroupBot(account["groups"])
+    else:
+        bot = main_v11.WhatsAppBot(account["group"], account.get("whatList", 1))
+
+    threading.Thread(
+        target=_heartbeat_loop, args=(account["name"], bot, debug_port, heartbeats, heartbeat_every), daemon=True
+    ).start()
+    try:
+        bot.main()
+    finally:
+        if bot.whatsapp is not None:
+            bot.whatsapp.shutdown()
+
+
+def _heartbeat_loop(name, bot, debug_port, heartbeats, every):
+    # A thread só transporta o estado; quem prova que o bot está vivo é o
+    # progresso do loop principal (CycleTrace.mark_progress)
+    bots = getattr(bot, "bots", [bot])
+    while True:
+        trace = bot.trace
+        heartbeats.put({
+            "name": name,
+            "pid": os.getpid(),
+            "debug_port": debug_port,
+            "cycle": trace.cycle,
+            "progress_age_s": time.monotonic() - trace.progress_at if trace.progress_at is not None else None,
+            "progress_wait_s": trace.progress_wait,
+            "stages_ms": trace.stats(),
+            "groups": [
+                {"group": b.groupName, "chat_open": b.group_whatsapp_is_open, "sent_today": b.list_sent_for_today}
+                for b in bots
+            ],
+        })
+        time.sleep(every)
+
+
+def kill_orphan_chrome(debug_port):
+    """Encerra o Chrome que ficou vivo (detach) na porta de depuração de um worker morto."""
+    if not os.path.isdir("/proc"):
+        return 0
+    flag = f"--remote-debugging-port={debug_port}".encode()
+    killed = 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                args = f.read().split(b"\0")
+            if flag in args:
+                os.kill(int(entry), signal.SIGKILL)
+                killed += 1
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return killed
+
+
+class Worker:
+    """Estado de uma conta supervisionada."""
+    def __init__(self, index, account, debug_port):
+        self.index = index
+        self.account = account
+        self.name = account["name"]
+        self.debug_port = debug_port
+        self.process = None
+        self.started_at = None
+        self.terminating_at = None
+        self.next_start = 0.0
+        self.failures = 0       # quedas seguidas (zera depois de rodar estável)
+        self.restarts = 0
+        self.last_exit = None
+        self.heartbeat = None
+        self.heartbeat_at = None
+        self.progress_at = None     # última volta do loop do bot (relógio do supervisor)
+        self.progress_wait = 0.0    # espera que o bot planejou depois dela
+
+
+class Supervisor:
+    def __init__(self, accounts, base_port=9222, stagger=30, heartbeat_every=10, heartbeat_timeout=300,
+                 max_backoff=600, stable_after=600, status_path="supervisor_status.json"):
+        names = [a["name"] for a in accounts]
+        dirs = [os.path.abspath(a["user_data_dir"]) for a in accounts]
+        if len(set(names)) != len(names) or len(set(dirs)) != len(dirs):
+            raise ValueError("Cada conta precisa de um 'name' e um 'user_data_dir' únicos.")
+
+        # spawn: o worker começa limpo, sem threads nem sockets herdados do supervisor
+        self.ctx = multiprocessing.get_context("spawn")
+        self.heartbeats = self.ctx.Queue()
+        self.workers = [Worker(i, account, base_port + i) for i, account in enumerate(accounts)]
+        self.stagger = stagger
+        self.heartbeat_every = heartbeat_every
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.status_path = status_path
+        self.last_cold_start = None
+        self.running = True
+        self._status = {}
+        self._lock = threading.Lock()
+
+    def run(self):
+        print(f"[SUPERVISOR] {len(self.workers)} contas, portas {self.workers[0].debug_port}-{self.workers[-1].debug_port}.")
+        try:
+            while self.running:
+                self.step()
+                self.drain(timeout=1)
+                self.write_status()
+        finally:
+            self.stop_all()
+
+    def step(self):
+        now = time.monotonic()
+        for worker in self.workers:
+            process = worker.process
+            if process is not None and process.is_alive():
+                self._check_alive(worker, now)
+                continue
+
+            if process is not None:
+                self._on_exit(worker, now)
+
+            stagger_ok = self.last_cold_start is None or now - self.last_cold_start >= self.stagger
+            if now >= worker.next_start and stagger_ok:
+                self.start_worker(worker)
+                now = time.monotonic()
+
+    def start_worker(self, worker):
+        if kill_orphan_chrome(worker.debug_port):
+            print(f"[SUPERVISOR] Chrome órfão da porta {worker.debug_port} encerrado.")
+        worker.process = self.ctx.Process(
+            target=run_worker, name=f"bot-{worker.name}",
+            args=(worker.account, worker.debug_port, self.heartbeats, self.heartbeat_every),
+        )
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        worker.terminating_at = None
+        worker.heartbeat = None
+        worker.heartbeat_at = None
+        worker.progress_at = None
+        worker.progress_wait = 0.0
+        self.last_cold_start = worker.started_at
+        print(f"[SUPERVISOR] '{worker.name}' iniciado (pid {worker.process.pid}, porta {worker.debug_port}).")
+
+    def _check_alive(self, worker, now):
+        if worker.terminating_at is not None:
+            # Não saiu com SIGTERM a tempo: força
+            if now - worker.terminating_at > 15:
+                worker.process.kill()
+            return
+        last_seen = worker.heartbeat_at if worker.heartbeat_at is not None else worker.started_at
+        if now - last_seen > self.heartbeat_timeout:
+            reason = f"sem heartbeat há {now - last_seen:.0f}s"
+        elif worker.progress_at is not None and now - worker.progress_at > worker.progress_wait + self.heartbeat_timeout:
+            # O heartbeat sai de uma thread à parte: só o progresso mostra um loop travado
+            reason = f"loop principal parado há {now - worker.progress_at:.0f}s (espera planejada {worker.progress_wait:.0f}s)"
+        else:
+            return
+        print(f"[SUPERVISOR] '{worker.name}' {reason}. Reiniciando...")
+        worker.process.terminate()
+        worker.terminating_at = now
+
+    def _on_exit(self, worker, now):
+        worker.last_exit = worker.process.exitcode
+        worker.process.join(0)
+        worker.process = None
+        if now - worker.started_at >= self.stable_after:
+            worker.failures = 0
+        worker.failures += 1
+        worker.restarts += 1
+        delay = min(self.max_backoff, 5 * 2 ** (worker.failures - 1))
+        worker.next_start = now + delay
+        print(f"[SUPERVISOR] '{worker.name}' saiu (código {worker.last_exit}). Reiniciando em {delay:.0f}s.")
+        kill_orphan_chrome(worker.debug_port)
+
+    def drain(self, timeout):
+        """Consome os heartbeats pendentes (espera até `timeout` pelo primeiro)."""
+        try:
+            message = self.heartbeats.get(timeout=timeout)
+        except queue.Empty:
+            return
+        by_name = {worker.name: worker for worker in self.workers}
+        while True:
+            worker = by_name.get(message["name"])
+            if worker is not None and worker.process is not None and worker.process.pid == message["pid"]:
+                worker.heartbeat = message
+                worker.heartbeat_at = time.monotonic()
+                if message.get("progress_age_s") is not None:
+                    worker.progress_at = worker.heartbeat_at - message["progress_age_s"]
+                    worker.progress_wait = message.get("progress_wait_s") or 0.0
+            try:
+                message = self.heartbeats.get_nowait()
+            except queue.Empty:
+                return
+
+    def status(self):
+        now = time.monotonic()
+        workers = []
+        for worker in self.workers:
+            alive = worker.process is not None and worker.process.is_alive()
+            beat = worker.heartbeat or {}
+            workers.append({
+                "name": worker.name,
+                "alive": alive,
+                "pid": worker.process.pid if worker.process is not None else None,
+                "debug_port": worker.debug_port,
+                "user_data_dir": os.path.abspath(worker.account["user_data_dir"]),
+                "uptime_s": now - worker.started_at if alive else None,
+                "heartbeat_age_s": now - worker.heartbeat_at if worker.heartbeat_at is not None else None,
+                "progress_age_s": now - worker.progress_at if worker.progress_at is not None else None,
+                "restarts": worker.restarts,
+                "last_exit": worker.last_exit,
+                "next_start_in_s": max(0.0, worker.next_start - now) if not alive else None,
+                "cycle": beat.get("cycle"),
+                "groups": beat.get("groups", []),
+                "stages_ms": beat.get("stages_ms", {}),
+            })
+        return {
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+            "totals": {
+                "workers": len(workers),
+                "alive": sum(w["alive"] for w in workers),
+                "restarts": sum(w["restarts"] for w in workers),
+            },
+            "workers": workers,
+        }
+
+    def write_status(self):
+        status = self.status()
+        with self._lock:
+            self._status = status
+        if not self.status_path:
+            return
+        tmp = f"{self.status_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(status, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.status_path)
+
+    def current_status(self):
+        with self._lock:
+            return self._status
+
+    def serve_http(self, port, host="0.0.0.0"):
+        supervisor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("/health", ""):
+                    self.send_error(404)
+                    return
+                body = json.dumps(supervisor.current_status(), ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        httpd = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        print(f"[SUPERVISOR] Saúde dos workers em http://{host}:{port}/health")
+        return httpd
+
+    def stop_all(self, timeout=20):
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.kill()
+            kill_orphan_chrome(worker.debug_port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default=os.getenv("SUPERVISOR_CONFIG", "accounts.json"))
+    parser.add_argument("--base-port", type=int, default=9222, help="Porta de depuração da primeira conta")
+    parser.add_argument("--stagger", type=float, default=30, help="Segundos mínimos entre inícios a frio")
+    parser.add_argument("--heartbeat-timeout", type=float, default=300, help="Reinicia o worker sem heartbeat, ou com o loop parado além da espera planejada, por esse tempo")
+    parser.add_argument("--max-backoff", type=float, default=600)
+    parser.add_argument("--status", default="supervisor_status.json", help="Arquivo JSON com a saúde agregada")
+    parser.add_argument("--http-port", type=int, default=0, help="Expõe GET /health nessa porta (0 desliga)")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        accounts = json.load(f)
+
+    supervisor = Supervisor(
+        accounts, base_port=args.base_port, stagger=args.stagger,
+        heartbeat_timeout=args.heartbeat_timeout, max_backoff=args.max_backoff, status_path=args.status,
+    )
+
+    def stop(*_):
+        supervisor.running = False
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    if args.http_port:
+        supervisor.serve_http(args.http_port)
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Compara a latência por comando dos dois transportes do caminho crítico contra o fixture local:
+
+    driver   Selenium -> chromedriver (HTTP) -> Chrome
+    cdp      WebSocket CDP direto na aba (main_v11.CDPSession, CDP_TRANSPORT=1)
+
+Cada comando roda N vezes em cada transporte, alternando a ordem para não
+favorecer nenhum deles, e o tempo de ida e volta de cada chamada vai para os
+percentis (p50/p95/p99):
+
+    noop        script vazio (custo fixo do transporte)
+    composer    COMPOSER_READY_JS (is_group_open)
+    snapshot    SNAPSHOT_MESSAGES_JS com as 5 últimas mensagens
+    evaluate    Runtime.evaluate (execute_cdp_cmd vs. send direto)
+
+    python tools/bench_cdp.py --iterations 200 --output bench_cdp.json
+"""
+import argparse, json, os, sys, tempfile, time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_whatsapp import FakeWhatsAppServer
+from bench_latency import percentile, quiet, sample_list
+
+
+def commands(main_v11, driver, session):
+    """{comando: (chamada pelo chromedriver, chamada pelo WebSocket)}"""
+    evaluate = {"expression": "document.title", "returnByValue": True}
+    return {
+        "noop": (
+            lambda: driver.execute_script("return 1"),
+            lambda: session.call_script("return 1"),
+        ),
+        "composer": (
+            lambda: driver.execute_script(main_v11.COMPOSER_READY_JS),
+            lambda: session.call_script(main_v11.COMPOSER_READY_JS),
+        ),
+        "snapshot": (
+            lambda: driver.execute_script(main_v11.SNAPSHOT_MESSAGES_JS, 5),
+            lambda: session.call_script(main_v11.SNAPSHOT_MESSAGES_JS, 5),
+        ),
+        "evaluate": (
+            lambda: driver.execute_cdp_cmd("Runtime.evaluate", evaluate),
+            lambda: session.send("Runtime.evaluate", evaluate),
+        ),
+    }
+
+
+def measure(call, iterations, warmup):
+    for _ in range(warmup):
+        call()
+    values = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        call()
+        values.append((time.perf_counter() - t0) * 1000)
+    return values
+
+
+def summarize(values):
+    return {
+        "n": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--output", default="bench_cdp.json")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os prints do bot")
+    args = parser.parse_args()
+
+    fixture = FakeWhatsAppServer(port=0, group_name="Bot Test").start()
+    fixture.reset(messages=["bom dia", sample_list(40)])
+    os.environ["WHATSAPP_URL"] = fixture.url
+    os.environ.setdefault("CHROME_USER_DATA_DIR", tempfile.mkdtemp(prefix="wa-bench-"))
+
+    import main_v11
+    whatsapp = main_v11.Whatsapp("Bot Test")
+    session = None
+    results = {}
+    try:
+        with quiet(args.verbose):
+            whatsapp.main()
+            if not whatsapp.open_grup_whatsapp_web():
+                raise RuntimeError("Não foi possível abrir o grupo no fixture.")
+        session = whatsapp.open_cdp_session()
+        for i, (name, (via_driver, via_cdp)) in enumerate(commands(main_v11, whatsapp.driver, session).items()):
+            order = [("driver", via_driver), ("cdp", via_cdp)]
+            if i % 2:
+                order.reverse()
+            results[name] = {}
+            for transport, call in order:
+                results[name][transport] = summarize(measure(call, args.iterations, args.warmup))
+            print(f"{name}: ok", file=sys.stderr)
+    finally:
+        if session is not None:
+            session.close()
+        whatsapp.shutdown()
+        fixture.stop()
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "iterations": args.iterations,
+        "warmup": args.warmup,
+        "commands_ms": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'comando':<10} {'via':<7} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, by_transport in results.items():
+        for transport in ("driver", "cdp"):
+            stats = by_transport[transport]
+            print(f"{name:<10} {transport:<7} {stats['p50']:8.2f} {stats['p95']:8.2f} {stats['p99']:8.2f}")
+        speedup = by_transport["driver"]["p50"] / max(by_transport["cdp"]["p50"], 1e-6)
+        print(f"{'':<10} {'ganho':<7} {speedup:7.1f}x")
+    print(f"Resultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark de latência abertura -> envio do main_v11.WhatsAppBot contra o fixture local.
+
+Para cada iteração: reseta o fixture com uma lista válida, agenda a abertura do
+grupo e mede cada etapa do caminho crítico do bot:
+
+    detect   abertura do grupo na página -> bot percebe
+    scroll   Whatsapp._scroll_to_end
+    extract  get_list_from_whatsapp
+    parse    parse + put_name_in_list + reconstruct_list (build_reply)
+    send     send_message_with_javascript
+    total    abertura do grupo na página -> resposta chega na página
+
+Os percentis (p50/p95/p99) vão para um JSON para comparar execuções:
+
+    python tools/bench_latency.py --iterations 30 --output bench_latency.json
+"""
+import argparse, contextlib, io, json, math, os, random, sys, tempfile, time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_whatsapp import FakeWhatsAppServer
+
+STAGES = ["detect", "scroll", "extract", "parse", "send", "total"]
+
+
+def sample_list(names=8):
+    tomorrow = datetime.now() + timedelta(days=1)
+    lines = [f"lista {tomorrow.strftime('%d/%m')} 😁", "", "Ida 11:15"]
+    lines += [f"{i}. Pessoa {i}" for i in range(1, names + 1)]
+    lines += ["", "Volta 17:30"]
+    lines += [f"{i}. Pessoa {i}" for i in range(1, names + 1)]
+    return "\n".join(lines)
+
+
+def percentile(values, pct):
+    """Percentil pelo método nearest-rank."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples):
+    summary = {}
+    for stage in STAGES:
+        values = [s[stage] for s in samples if s.get(stage) is not None]
+        summary[stage] = {
+            "n": len(values),
+            "mean": sum(values) / len(values) if values else None,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+    return summary
+
+
+def quiet(verbose):
+    """Silencia os prints do bot durante as medições (a menos de --verbose)."""
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+
+def detect_open(bot, mode, timeout=10):
+    """Espera o grupo abrir do jeito que o loop principal faria."""
+    deadline = time.monotonic() + timeout
+    if mode == "event":
+        return bot.whatsapp.wait_for_group_open(timeout)
+    while time.monotonic() < deadline:
+        if bot.is_group_open():
+            return True
+        time.sleep(random.uniform(0.7, 1.5))
+    return False
+
+
+def run_iteration(bot, fixture, mode):
+    fixture.reset(messages=["bom dia", sample_list()])
+    bot.inputText = None
+    # Dá tempo da página aplicar o reset antes de agendar a abertura
+    time.sleep(0.3)
+    fixture.open_group(delay_ms=random.randint(300, 1200))
+
+    sample = {}
+    if not detect_open(bot, mode):
+        return None
+    sample["detect"] = time.time() * 1000
+
+    t0 = time.perf_counter()
+    bot.whatsapp._scroll_to_end()
+    t1 = time.perf_counter()
+    group_list = bot.get_list_from_whatsapp()
+    t2 = time.perf_counter()
+    reply = bot.build_reply(group_list)
+    t3 = time.perf_counter()
+    ok = bot.send_message_with_javascript(reply)
+    t4 = time.perf_counter()
+
+    arrived = fixture.wait_for_reply(timeout=10) if ok else None
+    results = fixture.results()
+    if arrived is None or results["opened_at"] is None:
+        return None
+
+    sample["detect"] -= results["opened_at"]
+    sample["scroll"] = (t1 - t0) * 1000
+    sample["extract"] = (t2 - t1) * 1000
+    sample["parse"] = (t3 - t2) * 1000
+    sample["send"] = (t4 - t3) * 1000
+    sample["total"] = results["open_to_reply_ms"]
+    return sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--mode", choices=["event", "poll"], default="event",
+                        help="event: MutationObserver (EVENT_DRIVEN_OPEN); poll: is_group_open a cada 0.7-1.5 s")
+    parser.add_argument("--output", default="bench_latency.json")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os prints do bot")
+    args = parser.parse_args()
+
+    fixture = FakeWhatsAppServer(port=0, group_name="Bot Test").start()
+    os.environ["WHATSAPP_URL"] = fixture.url
+    os.environ.setdefault("CHROME_USER_DATA_DIR", tempfile.mkdtemp(prefix="wa-bench-"))
+
+    import main_v11
+    bot = main_v11.WhatsAppBot("Bot Test")
+    samples = []
+    failures = 0
+    try:
+        with quiet(args.verbose):
+            bot.open_whatsapp_web()
+            if not bot.whatsapp.open_grup_whatsapp_web():
+                raise RuntimeError("Não foi possível abrir o grupo no fixture.")
+            bot.start_message_feed()
+        for i in range(args.iterations):
+            with quiet(args.verbose):
+                sample = run_iteration(bot, fixture, args.mode)
+            if sample is None:
+                failures += 1
+                print(f"[{i + 1}/{args.iterations}] falhou", file=sys.stderr)
+                continue
+            samples.append(sample)
+            print(f"[{i + 1}/{args.iterations}] total {sample['total']:.1f} ms", file=sys.stderr)
+    finally:
+        bot.stop_message_feed()
+        if bot.driver:
+            bot.driver.quit()
+        fixture.stop()
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "mode": args.mode,
+        "iterations": args.iterations,
+        "failures": failures,
+        "config": {
+            "event_driven_open": bot.eventDrivenOpen,
+            "message_feed": bot.useMessageFeed,
+            "snapshot_extraction": bot.snapshotExtraction,
+            "cdp_transport": bot.cdpTransport,
+            "fused_send": bot.fusedSend,
+        },
+        "stages_ms": summarize(samples),
+        "samples_ms": samples,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'etapa':<8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for stage, stats in report["stages_ms"].items():
+        cols = [f"{stats[p]:9.1f}" if stats[p] is not None else f"{'-':>9}" for p in ("p50", "p95", "p99")]
+        print(f"{stage:<8} {' '.join(cols)}")
+    print(f"Resultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Benchmark + corpus de regressão dos parsers de lista de todas as gerações do bot.
+
+Implementações comparadas (parse + inclusão do nome + remontagem da resposta):
+
+    v2.parse_sections      versions/main_v2.py  parse_sections + add_name_in_section + rebuild_text
+    v2.parse_sections_v2   versions/main_v2.py  parse_sections_v2 + add_name_in_section + rebuild_text_v2
+    v2.parse_sections_v3   versions/main_v2.py  parse_sections_v3 + add_name_in_section + rebuild_text_v2
+    v3.parse_sections_flex versions/main_v3.py  _collapse_tail_repeat + parse_sections_flex + rebuild_with_numbering
+    v8.split               versions/main_v8.py  parse_schedule_robust (split "Volta"/"Ida") + reconstruct_list
+    v11.tokenize_list      main_v11.py          tokenize_list + put_name_in_list + reconstruct_list
+    v11.ListModel          main_v11.py          idem, com o ListModel incremental entre versões da mensagem
+
+O corpus imita listas reais (cabeçalho com emoji, word joiners U+2060, entradas
+numeradas com ZWSP, títulos em caixa alta, nomes como "Idalina", rabo duplicado,
+listas com 100+ nomes) e traz a saída esperada: nomes de Ida e de Volta e, para
+o parser atual, o texto exato da resposta remontada (com NAME_TO_ADD). Cada
+caso é processado como a sequência de versões que o grupo vê enquanto a lista
+enche (um nome a mais por versão), que é o que o bot relê a cada ciclo.
+
+As gerações antigas têm outro formato de resposta, então só os nomes contam para
+elas. Para cada implementação: acertos no corpus, throughput (parses/s) e pico de
+memória alocada (tracemalloc) por passada. Sai com código 1 se o parser atual
+(v11) errar algum caso.
+
+    python tools/bench_parsers.py --repeat 5 --output bench_parsers.json
+"""
+import argparse, contextlib, importlib.util, io, json, os, re, sys, time, tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+NAME_TO_ADD = "Helio"
+ZWSP, WJ = "\u200b", "\u2060"
+_INVISIBLE = re.compile("[\u200b\u2060\ufeff]")
+_NUMBER = re.compile(r"^\s*\d+\s*[.)]\s*")
+_TIME = re.compile(r"^\d{1,2}(?::\d{2}|h\d{0,2})$")
+
+
+# --- Corpus ---------------------------------------------------------------
+
+def _people(prefix, count):
+    return [f"{prefix} {i}" for i in range(1, count + 1)]
+
+
+def _render(header, ida_title, ida, volta_title, volta, style="plain", tail=None):
+    """Monta o texto da lista no formato `style` (plain, zwsp, joiner, unnumbered)."""
+    def entry(i, name):
+        if style == "zwsp":
+            return f" {i}.{ZWSP}{name} "
+        if style == "joiner":
+            return f"{i}. {WJ}{name}"
+        if style == "unnumbered":
+            return name
+        return f"{i}. {name}"
+
+    lines = [header, "", ida_title]
+    lines += [entry(i, n) for i, n in enumerate(ida, 1)]
+    lines += ["", volta_title]
+    lines += [entry(i, n) for i, n in enumerate(volta, 1)]
+    if tail:
+        lines += tail
+    return "\n".join(lines)
+
+
+def _golden_reply(header, ida_time, ida, volta_time, volta):
+    """
+    Resposta esperada do bot atual, escrita a partir do formato e não do código:
+    cabeçalho, títulos só com o horário, entradas " N.<ZWSP>Nome " e NAME_TO_ADD
+    no fim das duas seções (whatList=1).
+    """
+    lines = [header.strip(), "", f" Ida {ida_time} "]
+    lines += [f" {i}.{ZWSP}{n.title()} " for i, n in enumerate([*ida, NAME_TO_ADD.lower()], 1)]
+    lines += [" ", f" Volta {volta_time} "]
+    lines += [f" {i}.{ZWSP}{n.title()} " for i, n in enumerate([*volta, NAME_TO_ADD.lower()], 1)]
+    return "\n".join(lines) + "\n"
+
+
+# Âncora do formato: se _golden_reply mudar por engano, este caso literal acusa
+CONNECTIVE_REPLY = (
+    "quarta 24/09\n\n Ida 11:15 \n 1.\u200bAna \n 2.\u200bHelio \n"
+    " \n Volta 17:30 \n 1.\u200bBia \n 2.\u200bHelio \n"
+)
+
+
+def build_corpus():
+    """Lista de casos: {name, text, versions, ida, volta, reply}. ida/volta None = não é lista."""
+    cases = []
+
+    def add(name, ida, volta, **kwargs):
+        header = kwargs.pop("header", "terça-feira 23/09 😁")
+        ida_title = kwargs.pop("ida_title", "Ida 11:15")
+        volta_title = kwargs.pop("volta_title", "Volta 17:30")
+        ida_time = kwargs.pop("ida_time", "11:15")
+        volta_time = kwargs.pop("volta_time", "17:30")
+        reply = kwargs.pop("reply", None)
+        text = _render(header, ida_title, ida, volta_title, volta, **kwargs)
+        # Versões intermediárias: a Volta enchendo um nome por vez
+        versions = [
+            _render(header, ida_title, ida, volta_title, volta[:k], style=kwargs.get("style", "plain"))
+            for k in range(max(0, len(volta) - 5), len(volta))
+        ] + [text]
+        expected_ida = [n.lower() for n in dict.fromkeys(ida)]
+        expected_volta = [n.lower() for n in dict.fromkeys(volta)]
+        cases.append({
+            "name": name, "text": text, "versions": versions,
+            "ida": expected_ida, "volta": expected_volta,
+            "reply": reply or _golden_reply(header, ida_time, expected_ida, volta_time, expected_volta),
+        })
+
+    add("template", ["Isabella"], ["Jaqueline", "Antonio", "João", "Isabella(unigran)", "Eduarda(unigran)", "Aline (unigram)"],
+        style="joiner")
+    add("zwsp_numbered", _people("Ana", 4), _people("Bruno", 6), style="zwsp")
+    add("uppercase_titles", _people("Carla", 3), _people("Davi", 5), ida_title="IDA 11:15", volta_title="volta - 17h30 🚐",
+        volta_time="17h30")
+    add("idalina", ["Idalina", "Marcos"], ["Idalina", "Paula"], header="lista da Idalina 18/10")
+    add("ida_e_volta_header", _people("Elisa", 3), _people("Fabio", 3), header="Lista de ida e volta 18/10 🚌")
+    add("unnumbered", _people("Gabi", 4), _people("Heitor", 4), style="unnumbered")
+    add("accented_title", _people("Iara", 2), _people("Júlio", 3), ida_title="Ída 11h", volta_title="VÔLTA 17h",
+        ida_time="11h", volta_time="17h")
+    add("connective_titles", ["Ana"], ["Bia"], header="quarta 24/09", ida_title="Ida às 11:15", volta_title="Volta às 17:30",
+        reply=CONNECTIVE_REPLY)
+    add("worded_titles", _people("Rui", 2), _people("Sara", 3), ida_title="Ida manhã 7h", volta_title="Volta de tarde 17h",
+        ida_time="7h", volta_time="17h")
+    add("short_connectives", _people("Tati", 2), _people("Ugo", 2), ida_title="Ida as 11:15", volta_title="Volta - 17:30")
+    add("colon_connective", _people("Vera", 2), _people("Will", 2), ida_title="IDA: 6h30", volta_title="volta a 18h",
+        ida_time="6h30", volta_time="18h")
+    volta = _people("Kaique", 5)
+    add("duplicated_tail", _people("Lia", 3), volta, tail=[f"{i}. {n}" for i, n in enumerate(volta[-3:], 3)])
+    add("long_120", _people("Maria", 60), _people("Nico", 120))
+    add("long_300", _people("Olga", 150), _people("Pedro", 300), style="zwsp")
+
+    for name, text in [
+        ("not_a_list", "bom dia pessoal, a van de ida sai 11:15 e a volta 17:30"),
+        ("missing_volta", "lista 18/10\n\nIda 11:15\n1. Ana\n2. Bia"),
+        ("idalina_chat", "Idalina: alguém sabe da volta de amanhã?"),
+    ]:
+        cases.append({"name": name, "text": text, "versions": [text], "ida": None, "volta": None, "reply": None})
+    return cases
+
+
+# --- Implementações -------------------------------------------------------
+
+GOLDEN_REPLY = set()  # implementações conferidas também pela resposta remontada
+
+def _load(path, module_name):
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _clean(name):
+    return _NUMBER.sub("", _INVISIBLE.sub("", name)).strip().lower()
+
+
+def _struct_sections(struct, fold):
+    """(ida, volta) a partir da estrutura {"sections": [{"title", "items"}]} das versões 2/3."""
+    found = {}
+    for sec in struct["sections"]:
+        title = fold(sec["title"]).strip()
+        for key in ("ida", "volta"):
+            if title.startswith(key) and key not in found:
+                found[key] = [_clean(item) for item in sec["items"] if _clean(item)]
+    if "ida" not in found or "volta" not in found:
+        return None
+    return found["ida"], found["volta"]
+
+
+def build_implementations():
+    impls, skipped = {}, {}
+
+    try:
+        v2 = _load("versions/main_v2.py", "bench_main_v2")
+
+        def v2_pipeline(parse, rebuild):
+            def run(text):
+                struct = parse(text)
+                extracted = _struct_sections(struct, v2._strip_accents_lower)
+                v2.add_name_in_section(struct, "Ida", NAME_TO_ADD)
+                v2.add_name_in_section(struct, "Volta", NAME_TO_ADD)
+                return extracted, rebuild(struct)
+            return run
+
+        impls["v2.parse_sections"] = lambda: v2_pipeline(v2.parse_sections, v2.rebuild_text)
+        impls["v2.parse_sections_v2"] = lambda: v2_pipeline(v2.parse_sections_v2, v2.rebuild_text_v2)
+        impls["v2.parse_sections_v3"] = lambda: v2_pipeline(v2.parse_sections_v3, v2.rebuild_text_v2)
+    except Exception as e:
+        skipped["v2.*"] = str(e)
+
+    try:
+        v3 = _load("versions/main_v3.py", "bench_main_v3")
+
+        def v3_pipeline():
+            def run(text):
+                struct = v3.parse_sections_flex(v3._collapse_tail_repeat(text))
+                extracted = _struct_sections(struct, v3._strip_accents_lower)
+                v3.add_name_continue_count(struct, "Ida", NAME_TO_ADD)
+                v3.add_name_continue_count(struct, "Volta", NAME_TO_ADD)
+                return extracted, v3.rebuild_with_numbering(struct)
+            return run
+
+        impls["v3.parse_sections_flex"] = v3_pipeline
+    except Exception as e:
+        skipped["v3.parse_sections_flex"] = str(e)
+
+    try:
+        v8 = _load("versions/main_v8.py", "bench_main_v8")
+
+        def v8_pipeline():
+            bot = v8.WhatsAppBot()
+
+            def run(text):
+                parsed = bot.parse_schedule_robust(text)
+                if isinstance(parsed, dict):
+                    return None, None
+                ida, volta = parsed
+                # O primeiro item é o resto da linha do título (o horário)
+                extracted = [n for i, n in enumerate(ida) if not (i == 0 and _TIME.match(n))], \
+                            [n for i, n in enumerate(volta) if not (i == 0 and _TIME.match(n))]
+                go, back = bot.put_name_in_list(list(ida), list(volta))
+                return extracted, bot.reconstruct_list(back, go)
+            return run
+
+        impls["v8.split"] = v8_pipeline
+    except Exception as e:
+        skipped["v8.split"] = str(e)
+
+    import main_v11
+
+    def v11_pipeline(incremental):
+        def factory():
+            bot = main_v11.WhatsAppBot()
+            model = main_v11.ListModel()
+
+            def run(text):
+                parsed = model.update(text) if incremental else main_v11.tokenize_list(text)
+                if parsed is None:
+                    return None, None
+                go, back = bot.put_name_in_list([parsed.ida.time, *parsed.ida.names], [parsed.volta.time, *parsed.volta.names])
+                return (list(parsed.ida.names), list(parsed.volta.names)), bot.reconstruct_list(back, go, parsed.head)
+            return run
+        return factory
+
+    impls["v11.tokenize_list"] = v11_pipeline(False)
+    impls["v11.ListModel"] = v11_pipeline(True)
+    # Só o bot atual produz a resposta no formato do corpus
+    GOLDEN_REPLY.update({"v11.tokenize_list", "v11.ListModel"})
+    return impls, skipped
+
+
+# --- Medição --------------------------------------------------------------
+
+def check(run, case, golden_reply=False):
+    """
+    True se a implementação extrai exatamente os nomes esperados (ou rejeita um
+    não-lista) e, com `golden_reply`, remonta exatamente a resposta esperada.
+    """
+    try:
+        extracted, reply = run(case["text"])
+    except Exception:
+        extracted, reply = None, None
+    if case["ida"] is None:
+        return extracted is None
+    if extracted is None or list(extracted[0]) != case["ida"] or list(extracted[1]) != case["volta"]:
+        return False
+    return not golden_reply or reply == case["reply"]
+
+
+def workload(run, cases):
+    parses = 0
+    for case in cases:
+        for version in case["versions"]:
+            try:
+                run(version)
+            except Exception:
+                pass
+            parses += 1
+    return parses
+
+
+def measure(factory, cases, repeat):
+    best = None
+    for _ in range(repeat):
+        run = factory()
+        start = time.perf_counter()
+        parses = workload(run, cases)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    run = factory()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    workload(run, cases)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"parses": parses, "best_s": best, "parses_per_s": parses / best if best else None, "peak_kb": peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Passadas pelo corpus por implementação (vale a melhor)")
+    parser.add_argument("--output", default="bench_parsers.json")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os prints dos parsers")
+    args = parser.parse_args()
+
+    cases = build_corpus()
+    # Os parsers antigos imprimem a cada chamada; fora do --verbose isso só distorce a medição
+    silence = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with silence:
+        impls, skipped = build_implementations()
+    for name, reason in skipped.items():
+        print(f"[AVISO] {name} ignorado: {reason}", file=sys.stderr)
+
+    results = {}
+    for name, factory in impls.items():
+        print(f"Medindo {name}...", file=sys.stderr)
+        with silence:
+            run = factory()
+            correctness = {case["name"]: check(run, case, name in GOLDEN_REPLY) for case in cases}
+            stats = measure(factory, cases, args.repeat)
+        results[name] = {"correct": sum(correctness.values()), "cases": correctness, **stats}
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "corpus": [{"name": c["name"], "versions": len(c["versions"]), "lines": c["text"].count("\n") + 1} for c in cases],
+        "skipped": skipped,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print(f"{'implementação':<24} {'acertos':>8} {'parses/s':>11} {'pico KB':>9}")
+    for name, r in results.items():
+        print(f"{name:<24} {r['correct']:>4}/{len(cases):<3} {r['parses_per_s']:11.0f} {r['peak_kb']:9.1f}")
+    failures = sorted({case for name, r in results.items() if name.startswith("v11.") for case, ok in r["cases"].items() if not ok})
+    if failures:
+        print(f"[REGRESSÃO] O parser atual errou: {', '.join(failures)}")
+    print(f"Resultados salvos em {args.output}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,443 @@
+"""
+Servidor local que imita o DOM do WhatsApp Web usado pelo main_v11.py.
+
+Serve uma página estática com div#app, a lateral com o span[title=<grupo>],
+div#main, div[role="log"] com bolhas message-in/message-out, o rodapé com a
+caixa contenteditable e, quando não logado, o div[data-ref] do QR.
+
+A página é controlada por uma API HTTP (ver FakeWhatsAppServer), o que permite
+"abrir o grupo" num instante escolhido e registrar quando a resposta chega:
+
+    python tools/fake_whatsapp.py --port 8765 --group "Bot Test"
+    WHATSAPP_URL=http://127.0.0.1:8765/ python main_v11.py
+
+    curl -X POST localhost:8765/control/message -d '{"text": "Ida ... Volta ..."}'
+    curl -X POST localhost:8765/control/open -d '{"delay_ms": 5000}'
+    curl localhost:8765/control/results
+"""
+import argparse, json, queue, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import Request, urlopen
+
+PAGE_HTML = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>WhatsApp</title>
+<style>
+    body { margin: 0; font-family: sans-serif; }
+    #app { display: flex; height: 100vh; }
+    #side { width: 30%; border-right: 1px solid #ccc; }
+    #main { flex: 1; display: flex; flex-direction: column; }
+    div[role="log"] { flex: 1; overflow-y: auto; padding: 8px; }
+    .message-in, .message-out { margin: 4px 0; padding: 6px; white-space: pre-wrap; border-radius: 6px; }
+    .message-in { background: #eee; }
+    .message-out { background: #dcf8c6; }
+    footer { min-height: 40px; border-top: 1px solid #ccc; padding: 6px; }
+    footer div[contenteditable] { min-height: 24px; outline: none; }
+</style>
+</head>
+<body>
+<div id="app"></div>
+<script>
+const GROUP = __GROUP__;
+const state = {loggedIn: true, open: false, messages: [], openTimer: null};
+const app = document.getElementById("app");
+
+const post = (path, body) => fetch(path, {
+    method: "POST", headers: {"Content-Type": "application/json"}, body: JSON.stringify(body),
+});
+const now = () => performance.timeOrigin + performance.now();
+
+function bubble(msg) {
+    const holder = document.createElement("div");
+    holder.setAttribute("data-id", msg.id);
+    const b = document.createElement("div");
+    b.className = msg.out ? "message-out" : "message-in";
+    const span = document.createElement("span");
+    span.className = "_ao3e selectable-text copyable-text";
+    span.dir = "ltr";
+    span.textContent = msg.text;
+    b.appendChild(span);
+    holder.appendChild(b);
+    return holder;
+}
+
+function renderFooter() {
+    const footer = document.querySelector("div#main footer");
+    if (!footer) return;
+    footer.innerHTML = "";
+    if (!state.open) {
+        const closed = document.createElement("div");
+        closed.textContent = "Somente admins podem enviar mensagens";
+        footer.appendChild(closed);
+        return;
+    }
+    const box = document.createElement("div");
+    box.setAttribute("contenteditable", "true");
+    box.setAttribute("role", "textbox");
+    box.setAttribute("data-tab", "10");
+    box.setAttribute("title", "Digite uma mensagem");
+    box.addEventListener("keydown", (e) => {
+        if (e.key !== "Enter" || e.shiftKey) return;
+        e.preventDefault();
+        const text = box.innerText;
+        if (!text.trim()) return;
+        const at = now();
+        box.innerHTML = "";
+        addMessage({id: "out-" + at, text: text, out: true});
+        post("/page/reply", {text: text, at: at});
+    });
+    footer.appendChild(box);
+}
+
+function renderPreview() {
+    // Prévia da última mensagem na linha do grupo, como na lista lateral real
+    const preview = document.querySelector("#side div[role='row'] span.preview");
+    if (!preview) return;
+    const last = state.messages[state.messages.length - 1];
+    preview.setAttribute("title", last ? last.text : "");
+    preview.textContent = last ? last.text.split("\n")[0] : "";
+}
+
+function addMessage(msg) {
+    state.messages.push(msg);
+    renderPreview();
+    const log = document.querySelector('div#main div[role="log"]');
+    if (!log) return;
+    log.appendChild(bubble(msg));
+    log.scrollTop = log.scrollHeight;
+}
+
+function setOpen(open) {
+    state.open = open;
+    renderFooter();
+    if (open) post("/page/opened", {at: now()});
+}
+
+function openChat() {
+    let main = document.getElementById("main");
+    if (main) main.remove();
+    main = document.createElement("div");
+    main.id = "main";
+    const header = document.createElement("header");
+    const headerTitle = document.createElement("span");
+    headerTitle.setAttribute("title", GROUP);
+    headerTitle.textContent = GROUP;
+    header.appendChild(headerTitle);
+    main.appendChild(header);
+    const log = document.createElement("div");
+    log.setAttribute("role", "log");
+    state.messages.forEach((m) => log.appendChild(bubble(m)));
+    main.appendChild(log);
+    main.appendChild(document.createElement("footer"));
+    app.appendChild(main);
+    renderFooter();
+    log.scrollTop = log.scrollHeight;
+}
+
+function renderApp() {
+    app.innerHTML = "";
+    if (!state.loggedIn) {
+        const qr = document.createElement("div");
+        qr.setAttribute("data-ref", "fake-qr-" + Date.now());
+        const canvas = document.createElement("canvas");
+        canvas.setAttribute("aria-label", "Scan this QR code to link a device!");
+        qr.appendChild(canvas);
+        app.appendChild(qr);
+        return;
+    }
+    const side = document.createElement("div");
+    side.id = "side";
+    const search = document.createElement("div");
+    search.setAttribute("contenteditable", "true");
+    search.setAttribute("role", "textbox");
+    side.appendChild(search);
+    const row = document.createElement("div");
+    row.setAttribute("role", "row");
+    const title = document.createElement("span");
+    title.setAttribute("dir", "auto");
+    title.setAttribute("title", GROUP);
+    title.textContent = GROUP;
+    row.appendChild(title);
+    const preview = document.createElement("span");
+    preview.className = "preview";
+    row.appendChild(preview);
+    row.addEventListener("click", openChat);
+    side.appendChild(row);
+    app.appendChild(side);
+}
+
+function handle(cmd) {
+    switch (cmd.type) {
+        case "state": {
+            // Num reset com o chat aberto, mantém div#main e só troca o conteúdo
+            const keepChat = state.loggedIn && cmd.logged_in && document.getElementById("side");
+            clearTimeout(state.openTimer);
+            state.loggedIn = cmd.logged_in;
+            state.open = cmd.open;
+            state.messages = [];
+            if (!keepChat) renderApp();
+            renderPreview();
+            const log = document.querySelector('div#main div[role="log"]');
+            if (log) log.innerHTML = "";
+            cmd.messages.forEach(addMessage);
+            renderFooter();
+            break;
+        }
+        case "message":
+            addMessage(cmd.message);
+            break;
+        case "open":
+            clearTimeout(state.openTimer);
+            // Abre exatamente no instante pedido (relógio da página)
+            state.openTimer = setTimeout(() => setOpen(true), Math.max(0, cmd.at - Date.now()));
+            break;
+        case "close":
+            clearTimeout(state.openTimer);
+            setOpen(false);
+            break;
+    }
+}
+
+const events = new EventSource("/events");
+events.onmessage = (e) => handle(JSON.parse(e.data));
+</script>
+</body>
+</html>
+"""
+
+
+class FakeWhatsAppServer:
+    """
+    Servidor HTTP do fixture. Os métodos públicos são a API de controle
+    (também expostos em /control/* para uso via curl ou de outro processo).
+    """
+    def __init__(self, host="127.0.0.1", port=8765, group_name="Bot Test"):
+        self.host = host
+        self.port = port
+        self.group_name = group_name
+        self._lock = threading.Lock()
+        self._clients = []
+        self._httpd = None
+        self._thread = None
+        self._next_id = 0
+        self.reset()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/"
+
+    # --- API de controle ---
+    def reset(self, messages=(), logged_in=True):
+        """Fecha o grupo, limpa o histórico e os resultados."""
+        with self._lock:
+            self.logged_in = logged_in
+            self.open = False
+            self.open_requested_at = None
+            self.opened_at = None
+            self.replies = []
+            self.messages = []
+        for text in messages:
+            self.post_message(text, broadcast=False)
+        self._broadcast(self._state_event())
+
+    def post_message(self, text, out=False, broadcast=True):
+        with self._lock:
+            self._next_id += 1
+            message = {"id": f"msg-{self._next_id}", "text": text, "out": out}
+            self.messages.append(message)
+        if broadcast:
+            self._broadcast({"type": "message", "message": message})
+        return message
+
+    def open_group(self, at=None, delay_ms=0):
+        """Agenda a abertura do grupo em `at` (epoch em ms) ou daqui a `delay_ms`."""
+        at = at if at is not None else time.time() * 1000 + delay_ms
+        with self._lock:
+            self.open_requested_at = at
+        self._broadcast({"type": "open", "at": at})
+        return at
+
+    def close_group(self):
+        with self._lock:
+            self.open = False
+            self.opened_at = None
+        self._broadcast({"type": "close"})
+
+    def login(self):
+        with self._lock:
+            self.logged_in = True
+        self._broadcast(self._state_event())
+
+    def results(self):
+        with self._lock:
+            return {
+                "open_requested_at": self.open_requested_at,
+                "opened_at": self.opened_at,
+                "replies": list(self.replies),
+                "open_to_reply_ms": (self.replies[0]["at"] - self.opened_at)
+                if self.replies and self.opened_at is not None else None,
+            }
+
+    def wait_for_reply(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self.replies:
+                    return self.replies[0]
+            time.sleep(0.01)
+        return None
+
+    # --- Ciclo de vida ---
+    def start(self):
+        server = self
+
+        class Handler(FakeWhatsAppHandler):
+            fixture = server
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-whatsapp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        for client in list(self._clients):
+            client.put(None)
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    # --- Internos ---
+    def _state_event(self):
+        with self._lock:
+            return {"type": "state", "logged_in": self.logged_in, "open": self.open, "messages": list(self.messages)}
+
+    def _broadcast(self, event):
+        for client in list(self._clients):
+            client.put(event)
+
+    def _page_opened(self, at):
+        with self._lock:
+            self.open = True
+            self.opened_at = at
+
+    def _page_reply(self, text, at):
+        with self._lock:
+            self.replies.append({"text": text, "at": at, "received_at": time.time() * 1000})
+            self._next_id += 1
+            self.messages.append({"id": f"msg-{self._next_id}", "text": text, "out": True})
+
+
+class FakeWhatsAppHandler(BaseHTTPRequestHandler):
+    fixture = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/":
+            body = PAGE_HTML.replace("__GROUP__", json.dumps(self.fixture.group_name)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == "/events":
+            self._stream_events()
+        elif path == "/control/results":
+            self._json(self.fixture.results())
+        else:
+            self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        data = self._body()
+        fixture = self.fixture
+        if path == "/page/opened":
+            fixture._page_opened(data["at"])
+        elif path == "/page/reply":
+            fixture._page_reply(data["text"], data["at"])
+        elif path == "/control/reset":
+            fixture.reset(messages=data.get("messages", ()), logged_in=data.get("logged_in", True))
+        elif path == "/control/message":
+            fixture.post_message(data["text"], out=data.get("out", False))
+        elif path == "/control/open":
+            fixture.open_group(at=data.get("at"), delay_ms=data.get("delay_ms", 0))
+        elif path == "/control/close":
+            fixture.close_group()
+        elif path == "/control/login":
+            fixture.login()
+        else:
+            self._json({"error": "not found"}, 404)
+            return
+        self._json({"ok": True})
+
+    def _stream_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        client = queue.Queue()
+        self.fixture._clients.append(client)
+        client.put(self.fixture._state_event())
+        try:
+            while True:
+                try:
+                    event = client.get(timeout=15)
+                except queue.Empty:
+                    # Mantém a conexão viva
+                    self.wfile.write(b": ping\n\n")
+                    self.wfile.flush()
+                    continue
+                if event is None:
+                    break
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.fixture._clients.remove(client)
+
+
+def control(base_url, path, payload=None):
+    """Chama a API de controle de um fixture rodando em outro processo."""
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = Request(base_url.rstrip("/") + path, data=data, headers={"Content-Type": "application/json"})
+    with urlopen(req, timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WhatsApp Web falso para testes locais do bot.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--group", default="Bot Test")
+    parser.add_argument("--logged-out", action="store_true", help="Começa na tela do QR")
+    args = parser.parse_args()
+
+    server = FakeWhatsAppServer(args.host, args.port, args.group)
+    server.reset(logged_in=not args.logged_out)
+    server.start()
+    print(f"Fixture do WhatsApp em {server.url} (grupo '{args.group}'). Ctrl+C para sair.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,168 @@
+"""
+Mede memória e CPU do Chrome do bot para cada perfil de lançamento (CHROME_PROFILE).
+
+Para cada perfil abre o WhatsApp (ou o fixture local com --fixture), entra no
+grupo, espera estabilizar e amostra a árvore de processos do Chrome via /proc:
+soma de RSS, soma de PSS (memória proporcional, não conta duas vezes o que é
+compartilhado), CPU% e número de processos. Só funciona em Linux (ex.: no container).
+
+    python tools/measure_chrome.py --fixture --profiles default lean --output bench_chrome.json
+"""
+import argparse, json, os, sys, tempfile, time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _read_stat(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        data = f.read()
+    # O nome do processo pode ter espaços: corta depois do último ')'
+    fields = data[data.rindex(")") + 2:].split()
+    ppid = int(fields[1])
+    cpu_ticks = int(fields[11]) + int(fields[12])
+    return ppid, cpu_ticks
+
+
+def _memory_kb(pid):
+    rss = pss = 0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1])
+                    break
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+                    break
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        pass
+    return rss, pss
+
+
+def process_tree(root_pid):
+    """PIDs descendentes de `root_pid` (sem incluir o próprio root)."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            ppid, _ = _read_stat(int(entry))
+        except (FileNotFoundError, ProcessLookupError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], list(children.get(root_pid, []))
+    while stack:
+        pid = stack.pop()
+        tree.append(pid)
+        stack.extend(children.get(pid, []))
+    return tree
+
+
+def sample(root_pid):
+    pids = process_tree(root_pid)
+    rss = pss = ticks = 0
+    for pid in pids:
+        try:
+            _, cpu = _read_stat(pid)
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+        r, p = _memory_kb(pid)
+        rss += r
+        pss += p
+        ticks += cpu
+    return {"processes": len(pids), "rss_mb": rss / 1024, "pss_mb": pss / 1024, "cpu_ticks": ticks}
+
+
+def measure_profile(profile, duration, settle, group_name):
+    import main_v11
+
+    os.environ["CHROME_PROFILE"] = profile
+    whatsapp = main_v11.Whatsapp(group_name)
+    started = time.perf_counter()
+    whatsapp.main()
+    if not whatsapp.open_grup_whatsapp_web():
+        raise RuntimeError(f"Não foi possível abrir o grupo '{group_name}'.")
+    ready_s = time.perf_counter() - started
+    try:
+        root = whatsapp.driver.service.process.pid
+        time.sleep(settle)
+        samples = []
+        prev = sample(root)
+        prev_t = time.monotonic()
+        end = prev_t + duration
+        while time.monotonic() < end:
+            time.sleep(1)
+            cur = sample(root)
+            now = time.monotonic()
+            cur["cpu_percent"] = 100.0 * (cur["cpu_ticks"] - prev["cpu_ticks"]) / CLOCK_TICKS / (now - prev_t)
+            samples.append(cur)
+            prev, prev_t = cur, now
+    finally:
+        whatsapp.shutdown()
+
+    mean = lambda key: sum(s[key] for s in samples) / len(samples) if samples else None
+    peak = lambda key: max(s[key] for s in samples) if samples else None
+    return {
+        "ready_seconds": ready_s,
+        "processes": peak("processes"),
+        "rss_mb_mean": mean("rss_mb"),
+        "rss_mb_max": peak("rss_mb"),
+        "pss_mb_mean": mean("pss_mb"),
+        "pss_mb_max": peak("pss_mb"),
+        "cpu_percent_mean": mean("cpu_percent"),
+        "cpu_percent_max": peak("cpu_percent"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", default=["default", "lean"])
+    parser.add_argument("--duration", type=int, default=60, help="Segundos de amostragem por perfil")
+    parser.add_argument("--settle", type=int, default=10, help="Segundos de espera antes de amostrar")
+    parser.add_argument("--group", default="Bot Test")
+    parser.add_argument("--fixture", action="store_true", help="Usa o WhatsApp falso local em vez do real")
+    parser.add_argument("--output", default="bench_chrome.json")
+    args = parser.parse_args()
+
+    fixture = None
+    if args.fixture:
+        from fake_whatsapp import FakeWhatsAppServer
+        from bench_latency import sample_list
+        fixture = FakeWhatsAppServer(port=0, group_name=args.group).start()
+        fixture.reset(messages=["bom dia", sample_list(40)])
+        os.environ["WHATSAPP_URL"] = fixture.url
+        os.environ.setdefault("CHROME_USER_DATA_DIR", tempfile.mkdtemp(prefix="wa-measure-"))
+
+    results = {}
+    try:
+        for profile in args.profiles:
+            print(f"Medindo perfil '{profile}'...", file=sys.stderr)
+            results[profile] = measure_profile(profile, args.duration, args.settle, args.group)
+    finally:
+        if fixture is not None:
+            fixture.stop()
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "target": "fixture" if args.fixture else os.getenv("WHATSAPP_URL", "https://web.whatsapp.com/"),
+        "duration_s": args.duration,
+        "profiles": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'perfil':<10} {'procs':>5} {'RSS MB':>8} {'PSS MB':>8} {'CPU %':>7} {'pronto s':>9}")
+    for profile, r in results.items():
+        print(f"{profile:<10} {r['processes'] or 0:>5} {r['rss_mb_mean'] or 0:8.1f} {r['pss_mb_mean'] or 0:8.1f} "
+              f"{r['cpu_percent_mean'] or 0:7.2f} {r['ready_seconds']:9.2f}")
+    print(f"Resultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()